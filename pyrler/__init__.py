@@ -1 +1,2 @@
-from . import core, utilities
\ No newline at end of file
+from . import core, utilities
+from .core.pyrler import Parler
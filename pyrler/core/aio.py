@@ -0,0 +1,378 @@
+import asyncio
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.packages.urllib3 import exceptions as urllib3_exceptions
+from requests.packages.urllib3.exceptions import MaxRetryError
+from requests.packages.urllib3.response import HTTPResponse
+from pyrler.core import pyrler
+from pyrler.utilities.logger import logger
+from pyrler.utilities.multipart import MultipartEncoder
+from pyrler.utilities.wrappers import async_paginate
+from pyrler.utilities.response import ParlerResponse
+from pyrler.utilities.client import retry_strategy, route_template, TIMEOUT, USER_AGENT
+from pyrler.utilities.tracing import fire
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class _AsyncParler(pyrler._Parler):
+    """
+    Base class for asyncio Parler API endpoints.
+
+    Endpoint methods are inherited from their blocking counterparts and return coroutines.
+    Requests share the retry and timeout policy of `pyrler.utilities.client.client`.
+    """
+
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, limit=100, **kwargs):
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for asyncio endpoints: pip install aiohttp")
+        if kwargs.get("accounts") is not None:
+            raise ValueError("Account pools are only supported by the blocking endpoints.")
+        if kwargs.get("cache") is not None:
+            raise ValueError("Response caches are only supported by the blocking endpoints.")
+        if kwargs.get("cassette") is not None:
+            raise ValueError("Cassettes are only supported by the blocking endpoints.")
+        pyrler._Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
+        self.limit = limit
+        self.session = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Rewrap the paginated methods of the blocking endpoint with the awaitable paginator.
+        for name in dir(cls):
+            func = getattr(getattr(cls, name), "paginated", None)
+            if func is not None:
+                setattr(cls, name, async_paginate(func))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the underlying aiohttp session.
+        :return:
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _client(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                cookies=self.cookies,
+                headers={"User-Agent": USER_AGENT},
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                timeout=aiohttp.ClientTimeout(sock_connect=TIMEOUT, sock_read=TIMEOUT)
+            )
+        return self.session
+
+    async def _throttle(self, route):
+        if self.limiter is None:
+            return
+        wait = self.limiter.reserve(route)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.limiter.reserve(route)
+
+    async def _request(self, method, route, params=None, **kwargs):
+        """
+        Sends a request, retrying like urllib3 does for the blocking client.
+        :param method: http method
+        :param route: tapi route
+        :param params: query parameters
+        :param kwargs:
+        :return: ParlerResponse
+        """
+        fire(self, "before_request", method, route, dict(kwargs, params=params))
+        started = time.perf_counter()
+        try:
+            response = await self._send(method, route, params, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self._record(method, route, None, time.perf_counter() - started, error=e)
+            raise
+        elapsed = time.perf_counter() - started
+        self._record(method, route, response, elapsed)
+        self._log_response(method, route, response, elapsed)
+        return response
+
+    async def _send(self, method, route, params=None, **kwargs):
+        template = route_template(route)
+        if self.breaker is not None:
+            self.breaker.allow(template)
+        if self.retry_budget is not None:
+            self.retry_budget.request()
+        try:
+            response = await self._retry(method, route, params, **kwargs)
+        except requests.exceptions.RequestException:
+            if self.breaker is not None:
+                self.breaker.record(template, False)
+            raise
+        except BaseException:
+            # Cancelled tasks and unexpected errors must not leave a probe outstanding.
+            if self.breaker is not None:
+                self.breaker.abandon(template)
+            raise
+        if self.breaker is not None:
+            self.breaker.record(template, response.status_code < 500)
+        return response
+
+    @staticmethod
+    def _error(e, url):
+        # Translate aiohttp errors so urllib3 Retry counts them as it would its own, read errors of requests
+        # that are not idempotent are not retried.
+        if isinstance(e, getattr(aiohttp, "ConnectionTimeoutError", ())):
+            return urllib3_exceptions.ConnectTimeoutError(str(e))
+        if isinstance(e, aiohttp.ClientConnectorError):
+            return urllib3_exceptions.NewConnectionError(None, str(e))
+        if isinstance(e, asyncio.TimeoutError):
+            return urllib3_exceptions.ReadTimeoutError(None, url, str(e))
+        return urllib3_exceptions.ProtocolError(str(e), e)
+
+    async def _retry(self, method, route, params=None, **kwargs):
+        url = self.parler_url + route
+        route = route_template(route)
+        if params:
+            # aiohttp rejects None query values where requests drops them.
+            params = {k: str(v) if isinstance(v, bool) else v for k, v in params.items() if v is not None}
+        retries = retry_strategy(self.limiter, retry_budget=self.retry_budget)
+        # Streamed bodies are rewound before each attempt, like urllib3 does.
+        body = kwargs.get("data")
+        position = body.tell() if hasattr(body, "seek") else None
+
+        while True:
+            if position is not None:
+                body.seek(position)
+            await self._throttle(route)
+            if self.timeouts is not None:
+                timeout = self.timeouts.timeout(route)
+                kwargs["timeout"] = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+            started = time.perf_counter()
+            try:
+                async with self._client().request(method, url, params=params, **kwargs) as r:
+                    content = await r.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = self._error(e, url)
+                if self.timeouts is not None and isinstance(error, urllib3_exceptions.TimeoutError) and \
+                        not isinstance(error, urllib3_exceptions.NewConnectionError):
+                    self.timeouts.timed_out(route, timeout)
+                try:
+                    retries = retries.increment(method=method, url=url, error=error)
+                except MaxRetryError as mre:
+                    if isinstance(error, urllib3_exceptions.ConnectTimeoutError) and \
+                            not isinstance(error, urllib3_exceptions.NewConnectionError):
+                        raise requests.exceptions.ConnectTimeout(mre) from e
+                    raise requests.exceptions.ConnectionError(mre) from e
+                except urllib3_exceptions.ReadTimeoutError as rte:
+                    raise requests.exceptions.ReadTimeout(rte) from e
+                except urllib3_exceptions.HTTPError as he:
+                    raise requests.exceptions.ConnectionError(he) from e
+                await asyncio.sleep(retries.get_backoff_time())
+                continue
+
+            response = ParlerResponse()
+            response.status_code = r.status
+            response.reason = r.reason
+            response.headers = CaseInsensitiveDict(r.headers)
+            response.url = str(r.url)
+            response.encoding = r.charset
+            response._content = content
+            # Keeps the retry history readable like that of a urllib3 response.
+            response.raw = HTTPResponse(status=r.status, headers=dict(r.headers), preload_content=False,
+                                        retries=retries)
+
+            if not retries.is_retry(method, r.status, has_retry_after="Retry-After" in r.headers):
+                if self.timeouts is not None and not retries.history:
+                    self.timeouts.observe(route, time.perf_counter() - started)
+                if self.limiter is not None and r.status == 429:
+                    retry_after = r.headers.get("Retry-After")
+                    self.limiter.penalize(route, retries.parse_retry_after(retry_after) if retry_after else None)
+                elif self.limiter is not None:
+                    self.limiter.reward(route)
+                return response
+
+            raw = HTTPResponse(status=r.status, headers=dict(r.headers), preload_content=False)
+            try:
+                retries = retries.increment(method=method, url=url, response=raw)
+            except MaxRetryError as mre:
+                if retries.raise_on_status:
+                    raise requests.exceptions.RetryError(mre, response=response)
+                return response
+            retry_after = retries.get_retry_after(raw) if retries.respect_retry_after_header else None
+            await asyncio.sleep(retry_after if retry_after is not None else retries.get_backoff_time())
+
+    async def _upload(self, route, fields, progress=None, **kwargs):
+        """
+        POSTs a multipart/form-data body streamed from disk.
+        :param route: tapi route
+        :param fields: form fields, see pyrler.utilities.multipart.MultipartEncoder
+        :param progress: callable taking the bytes sent and the body size
+        :param kwargs:
+        :return: requests.Reponse
+        """
+        with MultipartEncoder(fields, callback=progress) as body:
+            headers = dict(kwargs.pop("headers", None) or {}, **body.headers)
+            return await self._post_request(route=route, data=body, headers=headers, **kwargs)
+
+    def _bulk(self, fetch, ids, concurrency=8, stream=False):
+        """
+        Fetches many objects concurrently.
+        Duplicate IDs are fetched once. Objects whose request fails map to None.
+        :param fetch: callable taking an ID and returning a coroutine
+        :param ids: iterable of IDs, consumed lazily
+        :param concurrency: number of requests in flight
+        :param stream: return an async generator of (ID, response) tuples instead of a coroutine of a dict
+        :return: coroutine or async generator
+        """
+        results = self._bulk_stream(fetch, ids, concurrency)
+        return results if stream else self._bulk_dict(results)
+
+    @staticmethod
+    async def _bulk_dict(results):
+        return {object_id: response async for object_id, response in results}
+
+    @staticmethod
+    async def _bulk_stream(fetch, ids, concurrency):
+        async def work(object_id):
+            try:
+                return object_id, await fetch(object_id)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Fetching {object_id} failed: {e!r}")
+                return object_id, None
+
+        seen = set()
+        pending = set()
+        try:
+            for object_id in ids:
+                if object_id in seen:
+                    continue
+                seen.add(object_id)
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.ensure_future(work(object_id)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _get_request(self, route, **kwargs):
+        """
+        GET request class.
+        :param route: tapi route
+        :param kwargs:
+        :return: requests.Reponse
+        """
+        return await self._request("GET", route, **kwargs)
+
+    async def _post_request(self, route, **kwargs):
+        """
+        POST request class.
+        :param route: tapi route
+        :param kwargs:
+        :return: requests.Reponse
+        """
+        return await self._request("POST", route, **kwargs)
+
+    async def _patch_request(self, route, **kwargs):
+        """
+        PATCH request class.
+        :param route: tapi route
+        :param kwargs:
+        :return: requests.Reponse
+        """
+        return await self._request("PATCH", route, **kwargs)
+
+
+class AsyncComment(_AsyncParler, pyrler.Comment):
+    """
+    Comments
+    """
+
+
+class AsyncDiscover(_AsyncParler, pyrler.Discover):
+    """
+    Discover
+    """
+
+
+class AsyncFeed(_AsyncParler, pyrler.Feed):
+    """
+    Feed
+    """
+
+
+class AsyncFollow(_AsyncParler, pyrler.Follow):
+    """
+    Follow
+    """
+
+
+class AsyncHashtag(_AsyncParler, pyrler.Hashtag):
+    """
+    Hashtag
+    """
+
+
+class AsyncIdentity(_AsyncParler, pyrler.Identity):
+    """
+    Identity
+    """
+
+
+class AsyncMessaging(_AsyncParler, pyrler.Messaging):
+    """
+    Messaging
+    """
+
+
+class AsyncModeration(_AsyncParler, pyrler.Moderation):
+    """
+    Moderation
+    """
+
+
+class AsyncNews(_AsyncParler, pyrler.News):
+    """
+    News
+    """
+
+
+class AsyncNotification(_AsyncParler, pyrler.Notification):
+    """
+    Notification
+    """
+
+
+class AsyncPhoto(_AsyncParler, pyrler.Photo):
+    """
+    Photo
+    """
+
+
+class AsyncPost(_AsyncParler, pyrler.Post):
+    """
+    Post
+    """
+
+
+class AsyncProfile(_AsyncParler, pyrler.Profile):
+    """
+    Profile
+    """
+
+
+class AsyncUser(_AsyncParler, pyrler.User):
+    """
+    User
+    """
@@ -0,0 +1,67 @@
+import collections
+import time
+from pyrler.core import pyrler
+from pyrler.utilities.client import POOL_MAXSIZE
+from pyrler.utilities.logger import logger
+from pyrler.utilities.workers import stream
+
+# Per user paginated endpoints by name.
+ENDPOINTS = {
+    "posts": (pyrler.Post, "get_user_posts"),
+    "comments": (pyrler.Comment, "get_user_comments"),
+    "liked": (pyrler.Post, "get_liked_posts"),
+    "media": (pyrler.Post, "get_creator_media"),
+    "followers": (pyrler.Follow, "get_followers"),
+    "following": (pyrler.Follow, "get_following"),
+}
+
+CrawlItem = collections.namedtuple("CrawlItem", ["user_id", "endpoint", "item"])
+CrawlStatus = collections.namedtuple("CrawlStatus", ["user_id", "endpoint", "items", "error", "elapsed"])
+
+
+def crawl_users(user_ids, endpoints=("posts",), concurrency=8, buffer=1000, endkey=None, **kwargs):
+    """
+    Walks the history of many users concurrently and streams the results.
+
+    Yields a CrawlItem for every post, comment or user as it arrives and a CrawlStatus once a user's walk of an
+    endpoint has finished, with the number of items and the exception that ended it, if any.
+    Rate limits are shared by passing a `limiter` or `accounts` keyword, like any other endpoint argument.
+    :param user_ids: iterable of user IDs, consumed lazily
+    :param endpoints: names of ENDPOINTS to walk for each user
+    :param concurrency: number of walks in flight
+    :param buffer: maximum number of results waiting for the consumer
+    :param endkey: stop each walk before this page key
+    :param kwargs: endpoint constructor arguments
+    :return: generator of CrawlItem and CrawlStatus
+    """
+    kwargs.setdefault("log_stdout", False)
+    kwargs.setdefault("pool_maxsize", max(concurrency, POOL_MAXSIZE))
+    instances = {}
+    methods = {}
+    for name in endpoints:
+        cls, method = ENDPOINTS[name]
+        if cls not in instances:
+            instances[cls] = cls(**kwargs)
+        methods[name] = getattr(instances[cls], method)
+
+    def tasks():
+        for user_id in user_ids:
+            for name in endpoints:
+                yield user_id, name
+
+    def work(task, emit):
+        user_id, name = task
+        started = time.perf_counter()
+        count = 0
+        error = None
+        try:
+            for item in methods[name](user_id=user_id, stream="items", endkey=endkey):
+                if not emit(CrawlItem(user_id, name, item)):
+                    return
+                count += 1
+        except Exception as e:
+            logger.warning(f"Crawling {name} of {user_id} failed: {e!r}")
+            error = e
+        emit(CrawlStatus(user_id, name, count, error, time.perf_counter() - started))
+
+    return stream(tasks(), work, concurrency=concurrency, buffer=buffer)
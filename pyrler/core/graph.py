@@ -0,0 +1,130 @@
+import collections
+import sqlite3
+import threading
+from pyrler.core import pyrler
+from pyrler.utilities.bloom import BloomFilter
+from pyrler.utilities.client import POOL_MAXSIZE
+from pyrler.utilities.logger import logger
+from pyrler.utilities.workers import stream
+
+# `follower` follows `followee`; `user` is the profile returned for the newly discovered side of the edge.
+Edge = collections.namedtuple("Edge", ["follower", "followee", "depth", "user"])
+
+
+class Frontier:
+    """
+    SQLite backed priority queue of users waiting to be expanded, lowest priority first.
+    Pass a file path to keep frontiers of millions of users out of memory.
+    """
+
+    def __init__(self, path=":memory:"):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS frontier (seq INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, depth INTEGER,"
+            " priority REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS frontier_priority ON frontier (priority, seq)")
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM frontier").fetchone()[0]
+
+    def push(self, user_id, depth, priority):
+        with self._lock:
+            self._db.execute("INSERT INTO frontier (user_id, depth, priority) VALUES (?, ?, ?)",
+                             (user_id, depth, priority))
+
+    def pop(self):
+        """
+        Removes and returns the next (user_id, depth), or None when the frontier is empty.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT seq, user_id, depth FROM frontier ORDER BY priority, seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self._db.execute("DELETE FROM frontier WHERE seq = ?", (row[0],))
+            return row[1], row[2]
+
+
+def crawl_graph(seeds, direction="both", max_depth=2, max_nodes=None, concurrency=8, frontier=None, visited=None,
+                priority=None, buffer=1000, **kwargs):
+    """
+    Expands the follower graph around seed users breadth first and streams its edges.
+
+    Users are expanded in order of `priority(user_id, depth)`, breadth first by default. Each user is queued at
+    most once: `visited` is a BloomFilter sized for a million users unless another set-like object is given, and
+    `frontier` keeps the queue in SQLite.
+    :param seeds: iterable of user IDs
+    :param direction: "followers", "following" or "both"
+    :param max_depth: number of hops expanded from the seeds
+    :param max_nodes: maximum number of users queued, seeds included
+    :param concurrency: number of users expanded at once
+    :param frontier: Frontier, defaults to an in-memory frontier
+    :param visited: set-like object of queued user IDs supporting `in` and `add`
+    :param priority: callable taking a user ID and depth and returning a number, lowest expanded first
+    :param buffer: maximum number of edges waiting for the consumer
+    :param kwargs: Follow constructor arguments
+    :return: generator of Edge
+    """
+    kwargs.setdefault("log_stdout", False)
+    kwargs.setdefault("pool_maxsize", max(concurrency, POOL_MAXSIZE))
+    follow = pyrler.Follow(**kwargs)
+    frontier = frontier if frontier is not None else Frontier()
+    visited = visited if visited is not None else BloomFilter()
+    priority = priority or (lambda user_id, depth: depth)
+    directions = ("followers", "following") if direction == "both" else (direction,)
+
+    state = threading.Condition()
+    counts = {"queued": 0, "expanding": 0}
+
+    def enqueue(user_id, depth):
+        with state:
+            if user_id in visited or (max_nodes is not None and counts["queued"] >= max_nodes):
+                return
+            visited.add(user_id)
+            counts["queued"] += 1
+            frontier.push(user_id, depth, priority(user_id, depth))
+            state.notify()
+
+    for seed in seeds:
+        enqueue(seed, 0)
+
+    def tasks():
+        # Wait for in-flight expansions that may still discover users before declaring the crawl finished.
+        while True:
+            with state:
+                while True:
+                    task = frontier.pop()
+                    if task is not None:
+                        counts["expanding"] += 1
+                        break
+                    if counts["expanding"] == 0:
+                        return
+                    state.wait()
+            yield task
+
+    def work(task, emit):
+        user_id, depth = task
+        try:
+            for name in directions:
+                method = follow.get_followers if name == "followers" else follow.get_following
+                for user in method(user_id=user_id, stream="items"):
+                    neighbour = user.get("id") or user.get("_id")
+                    if neighbour is None:
+                        continue
+                    edge = Edge(neighbour, user_id, depth + 1, user) if name == "followers" else \
+                        Edge(user_id, neighbour, depth + 1, user)
+                    if not emit(edge):
+                        return
+                    if depth + 1 < max_depth:
+                        enqueue(neighbour, depth + 1)
+        except Exception as e:
+            logger.warning(f"Expanding {user_id} failed: {e!r}")
+        finally:
+            with state:
+                counts["expanding"] -= 1
+                state.notify_all()
+
+    return stream(tasks(), work, concurrency=concurrency, buffer=buffer)
@@ -0,0 +1,194 @@
+import collections
+import hashlib
+import mimetypes
+import os
+import requests
+from urllib.parse import urlsplit
+from pyrler.core import pyrler
+from pyrler.utilities.client import shared_client, POOL_MAXSIZE, TIMEOUT
+from pyrler.utilities.logger import logger
+from pyrler.utilities.state import MediaStore
+from pyrler.utilities.workers import stream
+
+# Host serving the files named by photo metadata.
+MEDIA_URL = "https://images.parler.com/"
+MEDIA_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".mp4", ".mov", ".m4v", ".webm")
+# Keys holding a media URL or file name in photo and media metadata.
+MEDIA_KEYS = ("url", "src", "image", "video", "filename", "original")
+
+MediaFile = collections.namedtuple("MediaFile", ["url", "path", "sha256", "size", "error"])
+
+
+def media_urls(item):
+    """
+    Returns the media URLs found in decoded photo, post or media metadata.
+    :param item: decoded JSON
+    :return: list of str
+    """
+    urls = []
+
+    def visit(value, key=None):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                visit(v, k)
+        elif isinstance(value, list):
+            for v in value:
+                visit(v, key)
+        elif isinstance(value, str) and key in MEDIA_KEYS:
+            if value.startswith(("http://", "https://")):
+                urls.append(value)
+            elif value.lower().endswith(MEDIA_EXTENSIONS):
+                urls.append(MEDIA_URL + value.lstrip("/"))
+
+    visit(item)
+    return list(dict.fromkeys(urls))
+
+
+def photo_urls(photo_ids, concurrency=8, **kwargs):
+    """
+    Looks up photos concurrently and yields their media URLs.
+    :param photo_ids: iterable of photo IDs
+    :param concurrency: number of requests in flight
+    :param kwargs: Photo constructor arguments
+    :return: generator of str
+    """
+    kwargs.setdefault("log_stdout", False)
+    photo = pyrler.Photo(**kwargs)
+
+    def work(photo_id, emit):
+        try:
+            body = photo.get_photo(photo_id=photo_id).json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Looking up photo {photo_id} failed: {e!r}")
+            return
+        for url in media_urls(body):
+            emit(url)
+
+    return stream(photo_ids, work, concurrency=concurrency)
+
+
+def creator_media_urls(user_id, **kwargs):
+    """
+    Walks a user's media listing and yields its media URLs.
+    :param user_id: User ID
+    :param kwargs: Post constructor arguments
+    :return: generator of str
+    """
+    kwargs.setdefault("log_stdout", False)
+    for item in pyrler.Post(**kwargs).get_creator_media(user_id=user_id, stream="items"):
+        yield from media_urls(item)
+
+
+def _extension(url, content_type):
+    extension = os.path.splitext(urlsplit(url).path)[1].lower()
+    if extension in MEDIA_EXTENSIONS:
+        return extension
+    return mimetypes.guess_extension((content_type or "").split(";")[0].strip()) or ""
+
+
+def _expected_size(response, offset):
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code == 206 and "/" in content_range and not content_range.endswith("*"):
+        return int(content_range.rsplit("/", 1)[1])
+    if response.headers.get("Content-Length") and not response.headers.get("Content-Encoding"):
+        return offset + int(response.headers["Content-Length"])
+    return None
+
+
+def download(url, directory, session, chunk_size=1 << 16):
+    """
+    Streams a file to disk and stores it under the SHA-256 of its content.
+
+    The body is written in chunks to a partial file named after the URL, so an interrupted download resumes
+    with a Range request. Files with the same content are stored once.
+    :param url: media URL
+    :param directory: media directory
+    :param session: requests.Session
+    :param chunk_size: bytes read at a time
+    :return: path of the stored file relative to `directory`, SHA-256, size
+    """
+    partial_dir = os.path.join(directory, "partial")
+    os.makedirs(partial_dir, exist_ok=True)
+    partial = os.path.join(partial_dir, hashlib.sha256(url.encode()).hexdigest())
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+        if offset and r.status_code == 416:
+            # The partial file is already complete.
+            content_type = r.headers.get("Content-Type")
+        else:
+            r.raise_for_status()
+            if r.status_code != 206:
+                offset = 0
+            content_type = r.headers.get("Content-Type")
+            expected = _expected_size(r, offset)
+            with open(partial, "ab" if offset else "wb") as f:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+            # urllib3 does not notice a connection closed before Content-Length bytes arrived.
+            if expected is not None and os.path.getsize(partial) != expected:
+                raise requests.exceptions.ConnectionError(
+                    f"Incomplete download of {url}: {os.path.getsize(partial)} of {expected} bytes", response=r
+                )
+
+    digest = hashlib.sha256()
+    with open(partial, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    sha256 = digest.hexdigest()
+    size = os.path.getsize(partial)
+    path = os.path.join(sha256[:2], sha256 + _extension(url, content_type))
+    os.makedirs(os.path.join(directory, sha256[:2]), exist_ok=True)
+    if os.path.exists(os.path.join(directory, path)):
+        os.remove(partial)
+    else:
+        os.replace(partial, os.path.join(directory, path))
+    return path, sha256, size
+
+
+def download_media(urls, directory, concurrency=8, chunk_size=1 << 16, limiter=None, buffer=1000):
+    """
+    Downloads media files concurrently into a content-addressed directory and streams the results.
+
+    Files are stored as <directory>/<sha256[:2]>/<sha256>.<ext>, so reposted images are stored once. URLs already
+    downloaded, by this or an earlier run, are not fetched again; interrupted downloads resume where they stopped.
+    Yields a MediaFile per URL, with the exception that ended it if the download failed.
+    :param urls: iterable of media URLs, consumed lazily
+    :param directory: media directory
+    :param concurrency: number of downloads in flight
+    :param chunk_size: bytes held in memory per download
+    :param limiter: optional pyrler.utilities.ratelimit.RateLimiter
+    :param buffer: maximum number of results waiting for the consumer
+    :return: generator of MediaFile
+    """
+    os.makedirs(directory, exist_ok=True)
+    store = MediaStore(os.path.join(directory, "media.sqlite"))
+    session = shared_client({}, MEDIA_URL, pool_maxsize=max(concurrency, POOL_MAXSIZE), limiter=limiter)
+    seen = set()
+
+    def tasks():
+        for url in urls:
+            if url not in seen:
+                seen.add(url)
+                yield url
+
+    def work(url, emit):
+        path = store.get(url)
+        if path is not None and os.path.exists(os.path.join(directory, path)):
+            sha256 = os.path.splitext(os.path.basename(path))[0]
+            emit(MediaFile(url, path, sha256, os.path.getsize(os.path.join(directory, path)), None))
+            return
+        try:
+            path, sha256, size = download(url, directory, session, chunk_size)
+        except (requests.exceptions.RequestException, OSError) as e:
+            logger.warning(f"Downloading {url} failed: {e!r}")
+            emit(MediaFile(url, None, None, 0, e))
+            return
+        store.set(url, path)
+        emit(MediaFile(url, path, sha256, size, None))
+
+    try:
+        yield from stream(tasks(), work, concurrency=concurrency, buffer=buffer)
+    finally:
+        store.close()
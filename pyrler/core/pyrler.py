@@ -1,10 +1,20 @@
+import hashlib
 import os
+import random
 import sys
+import threading
+import time
 import requests
 import logging
 from pyrler.utilities.wrappers import paginate
 from pyrler.utilities.logger import logger, setup_handlers
-from pyrler.utilities.client import client
+from pyrler.utilities.client import shared_client, request_key, route_template, POOL_CONNECTIONS, POOL_MAXSIZE
+from pyrler.utilities.singleflight import flights
+from pyrler.utilities.response import wrap, items
+from pyrler.utilities.multipart import MultipartEncoder
+from pyrler.utilities.metrics import attempts, body_size, registry
+from pyrler.utilities.tracing import HOOKS, fire, hooked
+from pyrler.utilities import workers
 
 
 class _Parler:
@@ -12,16 +22,168 @@ class _Parler:
     Base class for Parler API endpoints.
     """
 
-    def __init__(self, log_stdout, log_file, log_level):
-        self.parler_url = "https://api.parler.com"
+    def __init__(self, log_stdout, log_file, log_level, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 limiter=None, accounts=None, cache=None, coalesce=True, log_payload=True, payload_sample=1.0,
+                 transport="requests", timeouts=None, retry_budget=None, breaker=None, metrics=registry, hooks=None,
+                 parler_url="https://api.parler.com", cassette=None, mst_cookie=None, jst_cookie=None):
+        self.parler_url = parler_url
         self.log_stdout = log_stdout
         self.log_file = log_file
         self.log_level = log_level
-        self.mst_cookie = os.environ['MST_COOKIE']
-        self.jst_cookie = os.environ['JST_COOKIE']
-        self.cookies = {'mst': self.mst_cookie, 'jst': self.jst_cookie}
+        # Log a one line summary of each response instead of its body.
+        self.log_payload = log_payload
+        # Fraction of responses whose body is logged when log_payload is set, the others are summarized.
+        self.payload_sample = payload_sample
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.limiter = limiter
+        self.transport = transport
+        # Optional AdaptiveTimeout, RetryBudget and CircuitBreaker shared by every request.
+        self.timeouts = timeouts
+        self.retry_budget = retry_budget
+        self.breaker = breaker
+        self.cassette = cassette
+        # Metrics registry, None disables instrumentation.
+        self.metrics = metrics
+        self.hooks = {}
+        for name, funcs in (hooks or {}).items():
+            for func in funcs if isinstance(funcs, (list, tuple)) else [funcs]:
+                self.add_hook(name, func)
+        # An AccountPool replaces the single cookie pair from the environment.
+        self.accounts = accounts
+        self.cache = cache
+        # Share in-flight GETs with concurrent identical requests.
+        self.coalesce = coalesce
         setup_handlers(log_stdout=log_stdout, log_file=log_file, log_level=log_level)
-        self.session = client()
+        if accounts is None:
+            self.mst_cookie = mst_cookie or os.environ['MST_COOKIE']
+            self.jst_cookie = jst_cookie or os.environ['JST_COOKIE']
+            self.cookies = {'mst': self.mst_cookie, 'jst': self.jst_cookie}
+            self.session = shared_client(
+                self.cookies, self.parler_url, pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                limiter=limiter, transport=transport, timeouts=timeouts, retry_budget=retry_budget, breaker=breaker,
+                cassette=cassette
+            )
+
+    def _identity(self):
+        """
+        Returns a fingerprint of the endpoint's credentials, the cookies of every account of its pool if it has one.
+        :return: str
+        """
+        if self.accounts is not None:
+            cookies = sorted(sorted(account.cookies.items()) for account in self.accounts.accounts)
+        else:
+            cookies = sorted(self.cookies.items())
+        return hashlib.sha256(repr(cookies).encode()).hexdigest()[:16]
+
+    def _request(self, method, route, **kwargs):
+        """
+        Sends a request with the endpoint's session or through its account pool.
+        :param method: http method
+        :param route: tapi route
+        :param kwargs:
+        :return: ParlerResponse
+        """
+        fire(self, "before_request", method, route, kwargs)
+        started = time.perf_counter()
+        try:
+            response = wrap(self._send(method, route, **kwargs))
+        except requests.exceptions.RequestException as e:
+            self._record(method, route, None, time.perf_counter() - started, error=e)
+            raise
+        elapsed = time.perf_counter() - started
+        self._record(method, route, response, elapsed)
+        self._log_response(method, route, response, elapsed)
+        return response
+
+    def add_hook(self, name, func):
+        """
+        Registers a callable run on an event of this endpoint's requests and walks.
+        Hooks run on the thread that sends the request or consumes the walk and should return quickly.
+        :param name: one of pyrler.utilities.tracing.HOOKS
+        :param func: callable taking the event's arguments
+        :return:
+        """
+        if name not in HOOKS:
+            raise ValueError(f"Unknown hook {name!r}, expected one of {sorted(HOOKS)}")
+        self.hooks.setdefault(name, []).append(func)
+
+    def _record(self, method, route, response, elapsed, error=None):
+        """
+        Records a request in the endpoint's metrics registry and runs its response hooks.
+        :param method: http method
+        :param route: tapi route
+        :param response: requests.Response or None
+        :param elapsed: seconds spent on the request
+        :param error: exception raised by the request
+        :return:
+        """
+        if response is not None and self.hooks:
+            if hooked(self, "on_retry"):
+                retries = getattr(response.raw, "retries", None)
+                for attempt in retries.history if retries is not None else ():
+                    fire(self, "on_retry", method, route, attempt)
+            fire(self, "after_response", method, route, response, elapsed)
+        if self.metrics is None:
+            return
+        # Label by template so object IDs in paths don't create a series per object.
+        route = route_template(route)
+        if response is None:
+            self.metrics.record_request(method, route, latency=elapsed, error=error)
+            return
+        retries, rate_limited = attempts(response)
+        self.metrics.record_request(
+            method, route, response.status_code, elapsed, bytes_in=len(response.content),
+            bytes_out=body_size(response.request), retries=retries, rate_limited=rate_limited
+        )
+
+    def _send(self, method, route, **kwargs):
+        url = self.parler_url + route
+        if self.accounts is None:
+            return self.session.request(method, cookies=self.cookies, url=url, **kwargs)
+
+        # Rather than backing off on a rate limited account, move on to the next least loaded account.
+        # Mutations are sent once, on a single account.
+        attempts = len(self.accounts) if method == "GET" else 1
+        for attempt in range(attempts):
+            account = self.accounts.acquire()
+            session = shared_client(
+                account.cookies, self.parler_url, pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize, limiter=account.limiter or self.limiter,
+                retry_rate_limited=False, transport=self.transport, timeouts=self.timeouts,
+                retry_budget=self.retry_budget, breaker=self.breaker, cassette=self.cassette
+            )
+            try:
+                response = session.request(method, cookies=account.cookies, url=url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if not self.accounts.release(account, error=e) or attempt == attempts - 1:
+                    raise
+                continue
+            if not self.accounts.release(account, response=response) or attempt == attempts - 1:
+                return response
+
+    def _log_response(self, method, route, response, elapsed):
+        """
+        Logs a response without decoding or formatting anything the logger would discard.
+        :param method: http method
+        :param route: tapi route
+        :param response: ParlerResponse
+        :param elapsed: seconds spent on the request
+        :return:
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(response.headers)
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if self.log_payload and (self.payload_sample >= 1 or random.random() < self.payload_sample):
+            logger.info(body if body is not None else response.content)
+        else:
+            logger.info({"method": method, "route": route, "status": response.status_code, "items": len(items(body)),
+                         "bytes": len(response.content), "latency": round(elapsed, 3)})
 
     def _get_request(self, route, **kwargs):
         """
@@ -31,11 +193,18 @@ class _Parler:
         :param kwargs:
         :return: requests.Reponse
         """
-        url = self.parler_url + route
-        response = self.session.get(cookies=self.cookies, url=url, **kwargs)
-        logger.debug(response.headers)
-        logger.info(response.json())
-        return response
+        def fetch():
+            if self.cache is not None and self.cache.caches(route):
+                def send(headers):
+                    return self._request("GET", route, **dict(kwargs, headers={**headers, **kwargs.get("headers", {})}))
+                scope = f"{self.parler_url} {self._identity()}"
+                return self.cache.get(route, kwargs.get("params"), send, scope=scope)
+            return self._request("GET", route, **kwargs)
+
+        if self.coalesce:
+            # Responses to the same request differ between accounts, e.g. notifications or the caller's own profile.
+            return flights.do((self.parler_url, self._identity(), request_key(route, kwargs.get("params"))), fetch)
+        return fetch()
 
     def _post_request(self, route, **kwargs):
         """
@@ -45,11 +214,7 @@ class _Parler:
         :param kwargs:
         :return: requests.Reponse
         """
-        url = self.parler_url + route
-        response = self.session.post(cookies=self.cookies, url=url, **kwargs)
-        logger.debug(response.headers)
-        logger.info(response.json())
-        return response
+        return self._request("POST", route, **kwargs)
 
     def _patch_request(self, route, **kwargs):
         """
@@ -59,10 +224,48 @@ class _Parler:
         :param kwargs:
         :return: requests.Reponse
         """
-        url = self.parler_url + route
-        response = self.session.patch(cookies=self.cookies, url=url, **kwargs)
-        logger.info(response.json())
-        return response
+        return self._request("PATCH", route, **kwargs)
+
+    def _upload(self, route, fields, progress=None, **kwargs):
+        """
+        POSTs a multipart/form-data body streamed from disk.
+        :param route: tapi route
+        :param fields: form fields, see pyrler.utilities.multipart.MultipartEncoder
+        :param progress: callable taking the bytes sent and the body size
+        :param kwargs:
+        :return: requests.Reponse
+        """
+        with MultipartEncoder(fields, callback=progress) as body:
+            headers = dict(kwargs.pop("headers", None) or {}, **body.headers)
+            return self._post_request(route=route, data=body, headers=headers, **kwargs)
+
+    def _bulk(self, fetch, ids, concurrency=8, stream=False):
+        """
+        Fetches many objects concurrently.
+        Duplicate IDs are fetched once. Objects whose request fails map to None.
+        :param fetch: callable taking an ID and returning a requests.Response
+        :param ids: iterable of IDs, consumed lazily
+        :param concurrency: number of requests in flight
+        :param stream: return a generator of (ID, response) tuples instead of a dict
+        :return: dict or generator
+        """
+        def unique():
+            seen = set()
+            for object_id in ids:
+                if object_id not in seen:
+                    seen.add(object_id)
+                    yield object_id
+
+        def work(object_id, emit):
+            try:
+                response = fetch(object_id)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Fetching {object_id} failed: {e!r}")
+                response = None
+            emit((object_id, response))
+
+        results = workers.stream(unique(), work, concurrency=concurrency)
+        return results if stream else dict(results)
 
 
 class Comment(_Parler):
@@ -70,8 +273,8 @@ class Comment(_Parler):
     Comments
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     def get_comment(self, comment_id=None, startkey=None, **kwargs):
         """
@@ -85,6 +288,18 @@ class Comment(_Parler):
         request_params = {"id": comment_id, "startkey": startkey}
         return self._get_request(route=route, params=request_params, **kwargs)
 
+    def get_comments(self, comment_ids, concurrency=8, stream=False, **kwargs):
+        """
+        Returns many comments identified by their IDs, fetched concurrently.
+        :param comment_ids: iterable of comment IDs
+        :param concurrency: number of requests in flight
+        :param stream: return a generator of (comment ID, response) tuples
+        :param kwargs:
+        :return: dict of comment ID to response
+        """
+        return self._bulk(lambda comment_id: self.get_comment(comment_id=comment_id, **kwargs), comment_ids,
+                          concurrency=concurrency, stream=stream)
+
     @paginate
     def get_user_comments(self, user_id=None, startkey=None, follow=False, **kwargs):
         """
@@ -151,8 +366,8 @@ class Discover(_Parler):
     Discover
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def discover_hashtags(self, startkey=None, follow=False, **kwargs):
@@ -208,8 +423,8 @@ class Feed(_Parler):
     Feed
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_feed(self, startkey=None, limit=None, follow=False, **kwargs):
@@ -230,8 +445,8 @@ class Follow(_Parler):
     Follow
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_followers(self, user_id=None, startkey=None, limit=None, follow=False, **kwargs):
@@ -350,8 +565,8 @@ class Hashtag(_Parler):
     Hashtag
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def search(self, search=None, startkey=None, limit=None, follow=False, **kwargs):
@@ -373,8 +588,8 @@ class Identity(_Parler):
     Identity
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     def get_user_verification_status(self, **kwargs):
         route = "/v1/identity/status"
@@ -386,8 +601,8 @@ class Messaging(_Parler):
     Messaging
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_conversations(self, startkey=None, limit=None, follow=False, **kwargs):
@@ -525,8 +740,8 @@ class Moderation(_Parler):
     Moderation
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_approved_comments(self, organization=None, startkey=None, limit=None, reverse=True, follow=False, **kwargs):
@@ -704,8 +919,8 @@ class News(_Parler):
     News
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_news(self, startkey=None, limit=None, follow=False, **kwargs):
@@ -740,8 +955,8 @@ class Notification(_Parler):
     Notification
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_notifications(self, startkey=None, limit=None, follow=False, **kwargs):
@@ -803,8 +1018,8 @@ class Photo(_Parler):
     Photo
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     def get_photo(self, photo_id=None, **kwargs):
         """
@@ -823,8 +1038,8 @@ class Post(_Parler):
     Post
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     def get_post(self, post_id=None, **kwargs):
         """
@@ -837,6 +1052,18 @@ class Post(_Parler):
         request_params = {"id": post_id}
         return self._get_request(route=route, params=request_params, **kwargs)
 
+    def get_posts(self, post_ids, concurrency=8, stream=False, **kwargs):
+        """
+        Returns many posts identified by their IDs, fetched concurrently.
+        :param post_ids: iterable of post IDs
+        :param concurrency: number of requests in flight
+        :param stream: return a generator of (post ID, response) tuples
+        :param kwargs:
+        :return: dict of post ID to response
+        """
+        return self._bulk(lambda post_id: self.get_post(post_id=post_id, **kwargs), post_ids,
+                          concurrency=concurrency, stream=stream)
+
     @paginate
     def get_post_comments(self, post_id=None, startkey=None, limit=None, reverse=True, follow=None, **kwargs):
         """
@@ -971,8 +1198,8 @@ class Profile(_Parler):
     Profile
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     def get_user_profile(self, user_id=None, username=None, **kwargs):
         """
@@ -986,6 +1213,21 @@ class Profile(_Parler):
         request_params = {"id": user_id, "username": username}
         return self._get_request(route=route, params=request_params, **kwargs)
 
+    def get_user_profiles(self, user_ids=None, usernames=None, concurrency=8, stream=False, **kwargs):
+        """
+        Returns many user profiles identified by their IDs or usernames, fetched concurrently.
+        :param user_ids: iterable of user IDs
+        :param usernames: iterable of usernames, used when user_ids is None
+        :param concurrency: number of requests in flight
+        :param stream: return a generator of (user ID or username, response) tuples
+        :param kwargs:
+        :return: dict of user ID or username to response
+        """
+        if user_ids is not None:
+            return self._bulk(lambda user_id: self.get_user_profile(user_id=user_id, **kwargs), user_ids,
+                              concurrency=concurrency, stream=stream)
+        return self._bulk(lambda username: self.get_user_profile(username=username, **kwargs), usernames or [],
+                          concurrency=concurrency, stream=stream)
 
     def get_profile_settings(self, **kwargs):
         """
@@ -1033,37 +1275,29 @@ class Profile(_Parler):
         # return self._post_request(route=route, data=data, **kwargs)
         pass
 
-    def upload_cover_photo(self, file_name, **kwargs):
+    def upload_cover_photo(self, file_name, progress=None, **kwargs):
         """
         Upload profile cover photo.
         :param file_name: path to file
+        :param progress: callable taking the bytes sent and the body size
         :param kwargs:
         :return:
         """
         route = "/v1/profile/cover-photo"
-        headers = {'Content-Disposition': 'form-data',
-                   'Content-Type': 'image/jpeg',
-                   'name': 'upload',
-                   'filename': 'cover-photo.jpeg'}
-        with open(file_name, 'rb') as f:
-            data = f
-        return self._post_request(route=route, headers=headers, data=data, **kwargs)
+        fields = {"upload": (os.path.basename(file_name), file_name)}
+        return self._upload(route=route, fields=fields, progress=progress, **kwargs)
 
-    def upload_profile_photo(self, file_name, **kwargs):
+    def upload_profile_photo(self, file_name, progress=None, **kwargs):
         """
         Upload profile photo.
         :param file_name: path to file
+        :param progress: callable taking the bytes sent and the body size
         :param kwargs:
         :return:
         """
         route = "/v1/profile/photo"
-        headers = {'Content-Disposition': 'form-data',
-                   'Content-Type': 'image/jpeg',
-                   'name': 'upload',
-                   'filename': 'photo.jpeg'}
-        with open(file_name, 'rb') as f:
-            data = f
-        return self._post_request(route=route, headers=headers, data=data, **kwargs)
+        fields = {"upload": (os.path.basename(file_name), file_name)}
+        return self._upload(route=route, fields=fields, progress=progress, **kwargs)
 
 
 class User(_Parler):
@@ -1071,8 +1305,8 @@ class User(_Parler):
     User
     """
 
-    def __init__(self, log_stdout=True, log_file=None, log_level=None):
-        _Parler.__init__(self, log_stdout, log_file, log_level)
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, **kwargs):
+        _Parler.__init__(self, log_stdout, log_file, log_level, **kwargs)
 
     @paginate
     def get_blocked_users(self, startkey=None, follow=None, **kwargs):
@@ -1207,3 +1441,62 @@ class User(_Parler):
                    "porn", "nude", "obscenity", "plagiarism", "bribe", "killing", "illegal"]
         data = {"reason": reason, "message": message, "id": user_id}
         return self._post_request(route=route, data=data, **kwargs)
+
+
+class Parler:
+    """
+    Entry point to every endpoint group.
+
+    Endpoint groups (`.post`, `.comment`, `.follow`, ...) are created on first access and share one session, one
+    set of credentials and the logging configured once here. Keyword arguments are passed to every endpoint, so
+    a limiter, account pool or cache given here applies to all of them.
+    """
+
+    ENDPOINTS = {
+        "comment": Comment,
+        "discover": Discover,
+        "feed": Feed,
+        "follow": Follow,
+        "hashtag": Hashtag,
+        "identity": Identity,
+        "messaging": Messaging,
+        "moderation": Moderation,
+        "news": News,
+        "notification": Notification,
+        "photo": Photo,
+        "post": Post,
+        "profile": Profile,
+        "user": User,
+    }
+
+    def __init__(self, log_stdout=True, log_file=None, log_level=None, mst_cookie=None, jst_cookie=None,
+                 **kwargs):
+        """
+        :param log_stdout: log to stdout
+        :param log_file: log to this file
+        :param log_level: log level
+        :param mst_cookie: mst session cookie, defaults to MST_COOKIE
+        :param jst_cookie: jst session cookie, defaults to JST_COOKIE
+        :param kwargs: endpoint arguments
+        """
+        if kwargs.get("accounts") is None:
+            mst_cookie = mst_cookie or os.environ['MST_COOKIE']
+            jst_cookie = jst_cookie or os.environ['JST_COOKIE']
+        self._kwargs = dict(kwargs, log_stdout=log_stdout, log_file=log_file, log_level=log_level,
+                            mst_cookie=mst_cookie, jst_cookie=jst_cookie)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        setup_handlers(log_stdout=log_stdout, log_file=log_file, log_level=log_level)
+
+    def __getattr__(self, name):
+        cls = type(self).ENDPOINTS.get(name)
+        if cls is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        with self._lock:
+            endpoint = self._endpoints.get(name)
+            if endpoint is None:
+                endpoint = self._endpoints[name] = cls(**self._kwargs)
+        return endpoint
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(type(self).ENDPOINTS)
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+import requests
+from pyrler.utilities.logger import logger
+from pyrler.utilities.ratelimit import RateLimiter
+
+
+class NoAccountAvailable(Exception):
+    """
+    Raised when every account in a pool has been evicted.
+    """
+
+
+class Account:
+    """
+    A Parler session cookie pair and its own rate budget.
+    """
+
+    def __init__(self, mst_cookie, jst_cookie, name=None, limiter=None):
+        self.name = name or mst_cookie[:8]
+        self.cookies = {'mst': mst_cookie, 'jst': jst_cookie}
+        self.limiter = limiter
+        self.in_flight = 0
+        self.failures = 0
+        self.cooldown_until = 0
+        self.evicted = False
+        self.last_used = 0
+
+    def __repr__(self):
+        return f"Account({self.name!r})"
+
+
+class AccountPool:
+    """
+    Distributes requests across several accounts.
+
+    Each request is routed to the healthy account with the fewest requests in flight. Accounts answering 401
+    are evicted, accounts answering 429 are cooled down with exponential backoff. A 403 answers the request for
+    that resource only and leaves the account healthy.
+    """
+
+    def __init__(self, accounts, rate=None, cooldown=30, max_cooldown=900):
+        """
+        :param accounts: list of Account or of (mst_cookie, jst_cookie) tuples
+        :param rate: per account requests per second, gives each account its own RateLimiter
+        :param cooldown: seconds an account sits out after its first 429
+        :param max_cooldown: upper bound of the cooldown backoff
+        """
+        self.accounts = []
+        for account in accounts:
+            if not isinstance(account, Account):
+                account = Account(*account)
+            if rate and account.limiter is None:
+                account.limiter = RateLimiter(rate=rate)
+            self.accounts.append(account)
+        if not self.accounts:
+            raise ValueError("AccountPool requires at least one account.")
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.accounts)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Loads cookie pairs from a file with one whitespace separated `mst jst` pair per line.
+        Blank lines and lines starting with # are ignored.
+        :param path: path to the credentials file
+        :param kwargs: AccountPool arguments
+        :return: AccountPool
+        """
+        accounts = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    accounts.append(tuple(line.split()[:2]))
+        return cls(accounts, **kwargs)
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """
+        Loads cookie pairs from MST_COOKIE/JST_COOKIE and numbered MST_COOKIE_1/JST_COOKIE_1, ... variables.
+        :param kwargs: AccountPool arguments
+        :return: AccountPool
+        """
+        accounts = []
+        if os.environ.get("MST_COOKIE") and os.environ.get("JST_COOKIE"):
+            accounts.append((os.environ["MST_COOKIE"], os.environ["JST_COOKIE"]))
+        i = 1
+        while os.environ.get(f"MST_COOKIE_{i}") and os.environ.get(f"JST_COOKIE_{i}"):
+            accounts.append((os.environ[f"MST_COOKIE_{i}"], os.environ[f"JST_COOKIE_{i}"]))
+            i += 1
+        return cls(accounts, **kwargs)
+
+    def healthy(self):
+        """
+        Returns the accounts that may currently receive requests.
+        :return: list of Account
+        """
+        now = time.time()
+        return [a for a in self.accounts if not a.evicted and a.cooldown_until <= now]
+
+    def acquire(self):
+        """
+        Blocks until an account is available and reserves it for one request.
+        :return: Account
+        """
+        with self._condition:
+            while True:
+                healthy = self.healthy()
+                if healthy:
+                    account = min(healthy, key=lambda a: (a.in_flight, a.last_used))
+                    account.in_flight += 1
+                    account.last_used = time.time()
+                    return account
+
+                cooling = [a.cooldown_until for a in self.accounts if not a.evicted]
+                if not cooling:
+                    raise NoAccountAvailable("Every account in the pool has been evicted.")
+                self._condition.wait(max(min(cooling) - time.time(), 0.01))
+
+    def release(self, account, response=None, error=None):
+        """
+        Returns an account to the pool and updates its health from the outcome of its request.
+        :param account: Account returned by acquire
+        :param response: requests.Response
+        :param error: exception raised by the request
+        :return: True when the account was evicted or cooled down
+        """
+        status = response.status_code if response is not None else None
+        with self._condition:
+            account.in_flight -= 1
+            unhealthy = True
+            if status == 401:
+                account.evicted = True
+                logger.warning(f"Evicted account {account.name} after HTTP {status}.")
+            elif status == 429 or isinstance(error, requests.exceptions.RetryError):
+                account.failures += 1
+                backoff = min(self.cooldown * 2 ** (account.failures - 1), self.max_cooldown)
+                account.cooldown_until = time.time() + backoff
+                logger.warning(f"Cooling down account {account.name} for {backoff}s.")
+            else:
+                unhealthy = False
+                if error is None:
+                    account.failures = 0
+            self._condition.notify_all()
+        return unhealthy
@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import time
+from requests.structures import CaseInsensitiveDict
+from pyrler.utilities.client import request_key
+from pyrler.utilities.response import ParlerResponse
+
+# Read-only routes cached by default and their time to live in seconds.
+DEFAULT_TTLS = {
+    "/v1/comment": 300,
+    "/v1/photo": 86400,
+    "/v1/post": 3600,
+    "/v1/profile": 3600,
+}
+
+
+class ResponseCache:
+    """
+    SQLite backed cache for GET responses of read-only routes.
+
+    Responses are cached per API and credentials, routes like /v1/profile answer with the caller's own data
+    when no object is named.
+    Entries expire after their route's TTL and the least recently used entries are evicted once the cache
+    holds more than `max_entries`. Expired entries carrying an ETag or Last-Modified header are revalidated
+    with a conditional request instead of being fetched again.
+    """
+
+    def __init__(self, path="pyrler_cache.sqlite", ttls=None, max_entries=100000):
+        """
+        :param path: SQLite database file, ":memory:" keeps the cache in memory
+        :param ttls: dict of route to time to live in seconds, defaults to DEFAULT_TTLS
+        :param max_entries: number of responses kept before evicting the least recently used
+        """
+        self.path = path
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, status INTEGER, headers TEXT, content BLOB, url TEXT, encoding TEXT, "
+            "stored_at REAL, accessed_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        """
+        Returns the cache counters.
+        :return: dict
+        """
+        return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations,
+                "evictions": self.evictions}
+
+    def caches(self, route):
+        """
+        Returns True if responses of a route are cached.
+        :param route: tapi route
+        :return: bool
+        """
+        return route in self.ttls
+
+    def _load(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, content, url, encoding, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            return None, None
+
+        status, headers, content, url, encoding, stored_at = row
+        response = ParlerResponse()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response._content = content
+        response.url = url
+        response.encoding = encoding
+        response.from_cache = True
+        return response, stored_at
+
+    def _store(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.status_code, json.dumps(dict(response.headers)), response.content, response.url,
+                 response.encoding, now, now)
+            )
+            excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def _touch(self, key):
+        with self._lock:
+            self._db.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+
+    def get(self, route, params, send, scope=""):
+        """
+        Returns the cached response of a request, fetching or revalidating it with `send` when needed.
+        :param route: tapi route
+        :param params: query parameters
+        :param send: callable taking a dict of extra request headers and returning a requests.Response
+        :param scope: base URL and credential fingerprint of the caller, responses are only shared within a scope
+        :return: requests.Response
+        """
+        key = f"{scope} {request_key(route, params)}" if scope else request_key(route, params)
+        cached, stored_at = self._load(key)
+        if cached is not None and time.time() - stored_at < self.ttls[route]:
+            self.hits += 1
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if cached.headers.get("ETag"):
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if cached.headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        response = send(headers)
+        if cached is not None and headers and response.status_code == 304:
+            self.revalidations += 1
+            self._touch(key)
+            return cached
+
+        self.misses += 1
+        if response.status_code == 200:
+            self._store(key, response)
+        return response
+
+    def clear(self):
+        """
+        Removes every cached response.
+        :return:
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+import requests
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"PYRC"
+CODECS = {b"z": "zlib", b"s": "zstd"}
+# Transient answers are sent again instead of being recorded.
+UNRECORDED_STATUSES = {429, 500, 502, 503, 504}
+# GET routes that change something, never replayed in "auto" mode.
+MUTATING_ROUTES = {"/v1/post/delete"}
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode for requests missing from the cassette.
+    """
+
+
+def _digest(body):
+    digest = hashlib.sha256()
+    if hasattr(body, "read") and hasattr(body, "seek"):
+        # Streamed bodies are hashed in chunks and rewound for sending.
+        position = body.tell()
+        for chunk in iter(lambda: body.read(1 << 16), b""):
+            digest.update(chunk)
+        body.seek(position)
+    else:
+        digest.update(body.encode() if isinstance(body, str) else bytes(body))
+    return digest.hexdigest()[:16]
+
+
+class Cassette:
+    """
+    Archive of recorded responses keyed by method, route and query parameters.
+
+    Records are compressed one by one with zstd, or zlib when zstandard is not installed, and appended to `path`.
+    An index of record offsets is kept in `path`.idx and rebuilt from the archive when it is missing or stale.
+
+    In "record" mode every response is sent and recorded, in "replay" mode requests are answered from the
+    archive without touching the network and unknown requests raise CassetteMiss, in "auto" mode recorded
+    GET requests are replayed and every other request, or GET listed in MUTATING_ROUTES, is sent and recorded.
+    Requests other than GETs are also keyed by a hash of their body.
+    """
+
+    def __init__(self, path, mode="auto", level=3):
+        """
+        :param path: archive file
+        :param mode: "record", "replay" or "auto"
+        :param level: compression level
+        """
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"mode must be 'record', 'replay' or 'auto', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.level = level
+        self.index = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._file = open(path, "rb")
+        else:
+            self._file = open(path, "a+b")
+            if self._file.seek(0, os.SEEK_END) == 0:
+                self._file.write(MAGIC + (b"s" if zstandard is not None else b"z"))
+                self._file.flush()
+        self._file.seek(0)
+        header = self._file.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC or header[len(MAGIC):] not in CODECS:
+            raise ValueError(f"{path} is not a cassette.")
+        self.codec = CODECS[header[len(MAGIC):]]
+        if self.codec == "zstd" and zstandard is None:
+            raise ImportError("zstandard is required to read this cassette: pip install zstandard")
+        self._load_index()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def key(method, url, body=None):
+        """
+        Returns the key of a request.
+        :param method: http method
+        :param url: request URL
+        :param body: request body, part of the key of requests other than GETs
+        :return: str
+        """
+        # Same normalization as pyrler.utilities.client.request_key.
+        parts = urlsplit(url)
+        key = f"{method} {parts.path}?{urlencode(sorted(parse_qsl(parts.query)))}"
+        if method != "GET" and body is not None:
+            key += f" {_digest(body)}"
+        return key
+
+    def _compress(self, data):
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress(data)
+        return zlib.compress(data, min(self.level * 2, 9))
+
+    def _decompress(self, data):
+        if self.codec == "zstd":
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def _size(self):
+        return os.fstat(self._file.fileno()).st_size
+
+    def _load_index(self):
+        try:
+            with open(self.path + ".idx") as f:
+                saved = json.load(f)
+            if saved["size"] == self._size():
+                self.index = saved["index"]
+                return
+        except (OSError, ValueError, KeyError):
+            pass
+
+        # Rebuild the index from the record headers, the records themselves stay compressed.
+        offset = len(MAGIC) + 1
+        size = self._size()
+        while offset + 8 <= size:
+            self._file.seek(offset)
+            key_length, data_length = struct.unpack(">II", self._file.read(8))
+            key = self._file.read(key_length).decode()
+            if offset + 8 + key_length + data_length > size:
+                break
+            self.index[key] = [offset + 8 + key_length, data_length]
+            offset += 8 + key_length + data_length
+        if offset < size and self.mode != "replay":
+            # Drop a record cut short by a crash so new records stay reachable.
+            self._file.truncate(offset)
+
+    def get(self, key):
+        """
+        Returns a recorded response.
+        :param key: request key
+        :return: dict with status, reason, headers, url and content, or None
+        """
+        with self._lock:
+            location = self.index.get(key)
+            if location is None:
+                return None
+            self._file.seek(location[0])
+            data = self._decompress(self._file.read(location[1]))
+        meta, _, content = data.partition(b"\n")
+        record = json.loads(meta)
+        record["content"] = content
+        return record
+
+    def put(self, key, response):
+        """
+        Appends a response to the archive.
+        :param key: request key
+        :param response: requests.Response
+        :return:
+        """
+        meta = json.dumps({"status": response.status_code, "reason": response.reason,
+                           "headers": dict(response.headers), "url": response.url}).encode()
+        data = self._compress(meta + b"\n" + response.content)
+        encoded = key.encode()
+        with self._lock:
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(struct.pack(">II", len(encoded), len(data)) + encoded + data)
+            self._file.flush()
+            self.index[key] = [offset + 8 + len(encoded), len(data)]
+
+    def flush(self):
+        """
+        Writes the index next to the archive.
+        :return:
+        """
+        with self._lock:
+            if self.mode == "replay" or self._file.closed:
+                return
+            tmp = f"{self.path}.idx.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"size": self._size(), "index": self.index}, f)
+            os.replace(tmp, self.path + ".idx")
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    Transport adapter answering requests from a Cassette and recording what it sends through another adapter.
+    Replayed requests skip the rate limiter, retries and the network.
+    """
+
+    def __init__(self, cassette, adapter):
+        """
+        :param cassette: Cassette
+        :param adapter: adapter sending the requests that are not replayed
+        """
+        super().__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        key = Cassette.key(request.method, request.url, request.body)
+        # Requests that change something are only replayed when asked to.
+        replayable = request.method == "GET" and urlsplit(request.url).path not in MUTATING_ROUTES
+        if self.cassette.mode == "replay" or (self.cassette.mode == "auto" and replayable):
+            record = self.cassette.get(key)
+            if record is not None:
+                return self._build_response(request, record)
+            if self.cassette.mode == "replay":
+                raise CassetteMiss(f"{key} is not in {self.cassette.path}", request=request)
+
+        response = self.adapter.send(request, **kwargs)
+        if response.status_code not in UNRECORDED_STATUSES:
+            self.cassette.put(key, response)
+        return response
+
+    def _build_response(self, request, record):
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.reason = record["reason"]
+        response.headers = CaseInsensitiveDict(record["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = record["content"]
+        response.url = record["url"] or request.url
+        response.request = request
+        response.connection = self
+        response.from_cassette = True
+        return response
+
+    def close(self):
+        self.adapter.close()
+        self.cassette.flush()
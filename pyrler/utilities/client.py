@@ -1,7 +1,70 @@
+import re
+import threading
+import time
 import requests
+from urllib.parse import urlencode, urlsplit
 from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from requests.packages.urllib3 import exceptions as urllib3_exceptions
+from requests.packages.urllib3.response import HTTPResponse
 from requests.packages.urllib3.util.retry import Retry
 
+from pyrler.utilities.cassette import CassetteAdapter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+USER_AGENT = "Parler%20Staging/545 CFNetwork/978.0.7 Darwin 18.7.0"
+TIMEOUT = 2
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# Routes embedding object IDs in their path and the template they are reported, rate limited and timed as.
+ROUTE_TEMPLATES = [
+    (re.compile(r"^/v1/post/[^/]+/impressions$"), "/v1/post/{id}/impressions"),
+    (re.compile(r"^/v1/messaging/conversations/user/[^/]+$"), "/v1/messaging/conversations/user/{id}"),
+    (re.compile(r"^/v1/messaging/conversations/[^/]+/(messages|accept|deny|mute)$"),
+     r"/v1/messaging/conversations/{id}/\1"),
+]
+
+
+def route_template(route):
+    """
+    Returns the route with the object IDs of its path replaced by {id}, so per route metrics, rate limits, circuit
+    breakers and timeouts don't grow with every object requested.
+    :param route: tapi route or URL path
+    :return: str
+    """
+    for pattern, template in ROUTE_TEMPLATES:
+        if pattern.match(route):
+            return pattern.sub(template, route)
+    return route
+
+
+def _timed_out(error):
+    """
+    Returns True if a request or one of its attempts failed on a connect or read timeout.
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    # Requests that ran out of retries carry the error of their last attempt as the reason of a MaxRetryError.
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        error = getattr(error.args[0], "reason", None)
+    # urllib3 1.x derives refused connections from ConnectTimeoutError.
+    return isinstance(error, urllib3_exceptions.TimeoutError) and \
+        not isinstance(error, urllib3_exceptions.NewConnectionError)
+
 
 class TimeoutHTTPAdapter(HTTPAdapter):
     def __init__(self, *args, **kwargs):
@@ -9,29 +72,317 @@ class TimeoutHTTPAdapter(HTTPAdapter):
         if kwargs.get("timeout"):
             self.timeout = kwargs["timeout"]
             del kwargs["timeout"]
+        self.limiter = kwargs.pop("limiter", None)
+        self.timeouts = kwargs.pop("timeouts", None)
+        self.retry_budget = kwargs.pop("retry_budget", None)
+        self.breaker = kwargs.pop("breaker", None)
         super().__init__(*args, **kwargs)
 
     def send(self, request, **kwargs):
+        route = route_template(urlsplit(request.url).path)
         timeout = kwargs.get("timeout")
         if timeout is None:
-            kwargs["timeout"] = self.timeout
+            kwargs["timeout"] = self.timeout if self.timeouts is None else self.timeouts.timeout(route)
+        if self.breaker is not None:
+            self.breaker.allow(route)
+        if self.retry_budget is not None:
+            self.retry_budget.request()
+        if self.limiter is not None:
+            self.limiter.acquire(route)
+
+        started = time.perf_counter()
+        try:
+            response = self.transmit(request, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if self.breaker is not None:
+                self.breaker.record(route, False)
+            if self.timeouts is not None and timeout is None and _timed_out(e):
+                self.timeouts.timed_out(route, kwargs["timeout"])
+            raise
+        except BaseException:
+            # Unexpected errors must not leave a probe outstanding.
+            if self.breaker is not None:
+                self.breaker.abandon(route)
+            raise
+        if self.breaker is not None:
+            self.breaker.record(route, response.status_code < 500)
+        retries = getattr(response.raw, "retries", None)
+        if self.timeouts is not None and timeout is None:
+            history = retries.history if retries is not None else ()
+            expired = sum(_timed_out(attempt.error) for attempt in history)
+            if expired:
+                self.timeouts.timed_out(route, kwargs["timeout"], expired)
+            if not history:
+                # Response times of retried requests include the backoff and would inflate the timeouts.
+                self.timeouts.observe(route, time.perf_counter() - started)
+
+        if self.limiter is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            self.limiter.penalize(route, self.max_retries.parse_retry_after(retry_after) if retry_after else None)
+        elif self.limiter is not None:
+            self.limiter.reward(route)
+        return response
+
+    def transmit(self, request, **kwargs):
+        """
+        Sends a prepared request with retries, without rate limiting.
+        """
         return super().send(request, **kwargs)
 
 
-def client():
+class HTTPXAdapter(TimeoutHTTPAdapter):
+    """
+    Transport adapter sending requests through httpx, over HTTP/2 when the h2 package is installed.
+
+    HTTP/2 multiplexes concurrent requests over a single connection per host. Timeouts, retries and rate limiting
+    behave as with TimeoutHTTPAdapter. Response bodies are read in full, so `stream=True` has no effect.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if httpx is None:
+            raise ImportError("httpx is required for the httpx transport: pip install Pyrler[http2]")
+        super().__init__(*args, **kwargs)
+        self.http2 = h2 is not None
+        self._client = httpx.Client(
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=self._pool_maxsize, max_keepalive_connections=self._pool_maxsize)
+        )
+
+    def close(self):
+        super().close()
+        self._client.close()
+
+    @staticmethod
+    def _timeout(timeout):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return httpx.Timeout(connect=connect, read=read, write=read, pool=connect)
+        return httpx.Timeout(timeout)
+
+    @staticmethod
+    def _error(e, url):
+        # Translate httpx errors so urllib3 Retry counts them as it would its own.
+        if isinstance(e, httpx.ConnectTimeout):
+            return urllib3_exceptions.ConnectTimeoutError(str(e))
+        if isinstance(e, httpx.ConnectError):
+            return urllib3_exceptions.NewConnectionError(None, str(e))
+        if isinstance(e, httpx.ReadTimeout):
+            return urllib3_exceptions.ReadTimeoutError(None, url, str(e))
+        return urllib3_exceptions.ProtocolError(str(e), e)
+
+    def build_httpx_response(self, request, r, retries=None):
+        response = requests.Response()
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = CaseInsensitiveDict(r.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        # httpx has already decoded the body.
+        response._content = r.content
+        # Keeps the retry history readable like that of a urllib3 response.
+        response.raw = HTTPResponse(status=r.status_code, headers=dict(r.headers), preload_content=False,
+                                    retries=retries)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def transmit(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        retries = self.max_retries
+        method, url = request.method, request.url
+        # Streamed bodies are rewound before each attempt, like urllib3 does.
+        position = request.body.tell() if hasattr(request.body, "seek") else None
+        while True:
+            if position is not None:
+                request.body.seek(position)
+            try:
+                r = self._client.request(method, url, headers=dict(request.headers), content=request.body,
+                                         timeout=self._timeout(timeout))
+            except httpx.TransportError as e:
+                error = self._error(e, url)
+                try:
+                    retries = retries.increment(method=method, url=url, error=error)
+                except urllib3_exceptions.MaxRetryError as mre:
+                    if isinstance(error, urllib3_exceptions.ConnectTimeoutError) and \
+                            not isinstance(error, urllib3_exceptions.NewConnectionError):
+                        raise requests.exceptions.ConnectTimeout(mre, request=request) from e
+                    raise requests.exceptions.ConnectionError(mre, request=request) from e
+                except urllib3_exceptions.ReadTimeoutError as rte:
+                    raise requests.exceptions.ReadTimeout(rte, request=request) from e
+                except urllib3_exceptions.HTTPError as he:
+                    raise requests.exceptions.ConnectionError(he, request=request) from e
+                retries.sleep()
+                continue
+
+            response = self.build_httpx_response(request, r, retries)
+            if not retries.is_retry(method, r.status_code, has_retry_after="Retry-After" in r.headers):
+                return response
+
+            raw = HTTPResponse(status=r.status_code, headers=dict(r.headers), preload_content=False)
+            try:
+                retries = retries.increment(method=method, url=url, response=raw)
+            except urllib3_exceptions.MaxRetryError as mre:
+                if retries.raise_on_status:
+                    raise requests.exceptions.RetryError(mre, request=request)
+                return response
+            retries.sleep(raw)
+
+
+def accept_encoding(transport="requests"):
+    """
+    Returns the Accept-Encoding header value for the content encodings a transport can decode.
+    :param transport: "requests" or "httpx"
+    :return: str
+    """
+    encodings = ["gzip", "deflate"]
+    for encoding, modules in (("br", ("brotli", "brotlicffi")), ("zstd", ("zstandard",))):
+        # urllib3 1.x has no zstd decoder.
+        if encoding == "zstd" and transport != "httpx":
+            continue
+        for module in modules:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+            encodings.append(encoding)
+            break
+    return ", ".join(encodings)
+
+
+class ParlerRetry(Retry):
+    """
+    urllib3 Retry that reports rate limited responses to a RateLimiter and waits for its budget before
+    each retry. With a RetryBudget, retries stop once the budget shared by every request is spent.
+    """
+
+    def __init__(self, *args, limiter=None, retry_budget=None, **kwargs):
+        self.limiter = limiter
+        self.retry_budget = retry_budget
+        self.route = None
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kw):
+        kw.setdefault("limiter", self.limiter)
+        kw.setdefault("retry_budget", self.retry_budget)
+        return super().new(**kw)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        route = route_template(urlsplit(url).path) if url else None
+        if self.limiter is not None and response is not None and response.status == 429:
+            self.limiter.penalize(route, self.get_retry_after(response))
+        new_retry = super().increment(
+            method=method, url=url, response=response, error=error, _pool=_pool, _stacktrace=_stacktrace
+        )
+        if self.retry_budget is not None and not self.retry_budget.withdraw():
+            reason = error or urllib3_exceptions.ResponseError(f"retry budget exhausted at HTTP {response.status}")
+            raise urllib3_exceptions.MaxRetryError(_pool, url, reason)
+        new_retry.route = route
+        return new_retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.limiter is not None:
+            self.limiter.acquire(self.route)
+
+
+def retry_strategy(limiter=None, retry_rate_limited=True, retry_budget=None):
     # Handles rate limit by reading 429 status code in HTTP header.
-    retry_strategy = Retry(
+    status_forcelist = [429, 500, 502, 503, 504] if retry_rate_limited else [500, 502, 503, 504]
+    return ParlerRetry(
+        limiter=limiter,
+        retry_budget=retry_budget,
         total=7,
         # Use incremental backoff.
         backoff_factor=1,
-        status_forcelist=[429, 500, 502, 503, 504],
-        method_whitelist=["GET", "PATCH"]
+        status_forcelist=status_forcelist,
+        method_whitelist=["GET", "PATCH"],
+        respect_retry_after_header=retry_rate_limited
     )
 
-    adapter = TimeoutHTTPAdapter(timeout=2, max_retries=retry_strategy)
+
+# Session transport adapters by name.
+TRANSPORTS = {
+    "requests": TimeoutHTTPAdapter,
+    "httpx": HTTPXAdapter,
+}
+
+
+def request_key(route, params=None):
+    """
+    Returns a key identifying a request by its route and normalized query parameters.
+    :param route: tapi route
+    :param params: query parameters
+    :return: str
+    """
+    params = sorted((k, str(v)) for k, v in (params or {}).items() if v is not None)
+    return f"{route}?{urlencode(params)}"
+
+
+def client(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, limiter=None,
+           retry_rate_limited=True, transport="requests", timeouts=None, retry_budget=None, breaker=None,
+           cassette=None):
+    if transport not in TRANSPORTS:
+        raise ValueError(f"transport must be one of {sorted(TRANSPORTS)}, not {transport!r}")
+    adapter = TRANSPORTS[transport](
+        timeout=TIMEOUT,
+        max_retries=retry_strategy(limiter, retry_rate_limited, retry_budget),
+        limiter=limiter,
+        timeouts=timeouts,
+        retry_budget=retry_budget,
+        breaker=breaker,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize
+    )
     session = requests.Session()
-    session.headers["User-Agent"] = "Parler%20Staging/545 CFNetwork/978.0.7 Darwin 18.7.0"
+    session.headers["User-Agent"] = USER_AGENT
+    session.headers["Accept-Encoding"] = accept_encoding(transport)
+    if cassette is not None:
+        adapter = CassetteAdapter(cassette, adapter)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
 
     return session
+
+
+def shared_client(cookies, base_url, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, limiter=None,
+                  retry_rate_limited=True, transport="requests", timeouts=None, retry_budget=None, breaker=None,
+                  cassette=None):
+    """
+    Returns the process-wide session for a cookie set, base URL, rate limiter, retry policy, transport and
+    resilience policy, creating it on first use.
+    Endpoint objects sharing a session share its keep-alive connection pool.
+    The pool sizes only apply when the session is created.
+    :param cookies: dict of session cookies
+    :param base_url: API base URL
+    :param pool_connections: number of host pools to cache
+    :param pool_maxsize: maximum number of connections kept alive per host
+    :param limiter: optional pyrler.utilities.ratelimit.RateLimiter
+    :param retry_rate_limited: retry 429 responses instead of returning them
+    :param transport: "requests" for HTTP/1.1 over urllib3 or "httpx" for HTTP/2 over httpx
+    :param timeouts: optional pyrler.utilities.resilience.AdaptiveTimeout
+    :param retry_budget: optional pyrler.utilities.resilience.RetryBudget
+    :param breaker: optional pyrler.utilities.resilience.CircuitBreaker
+    :param cassette: optional pyrler.utilities.cassette.Cassette recording or replaying every request
+    :return: requests.Session
+    """
+    key = (base_url, frozenset(cookies.items()), limiter, retry_rate_limited, transport, timeouts, retry_budget,
+           breaker, cassette)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = client(
+                pool_connections=pool_connections, pool_maxsize=pool_maxsize, limiter=limiter,
+                retry_rate_limited=retry_rate_limited, transport=transport, timeouts=timeouts,
+                retry_budget=retry_budget, breaker=breaker, cassette=cassette
+            )
+    return session
+
+
+def close_sessions():
+    """
+    Closes and forgets every shared session.
+    :return:
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
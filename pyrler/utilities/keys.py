@@ -0,0 +1,72 @@
+import datetime
+
+# Parler page keys look like 2021-02-16T14:53:30.429Z_322497 and sort in time order.
+KEY_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+# Items carry their creation time as 14 digits, e.g. 20210216145330.
+CREATED_AT_FORMAT = "%Y%m%d%H%M%S"
+
+
+def to_datetime(when):
+    """
+    Converts a datetime, a page key or a 14 digit creation time to a UTC datetime.
+    Naive datetimes are assumed to be UTC.
+    :param when: datetime, str or int
+    :return: datetime.datetime
+    """
+    if isinstance(when, datetime.datetime):
+        dt = when
+    elif isinstance(when, int) or (isinstance(when, str) and when.isdigit()):
+        dt = datetime.datetime.strptime(str(when), CREATED_AT_FORMAT)
+    else:
+        dt = datetime.datetime.strptime(when.split("_")[0], KEY_FORMAT)
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.astimezone(datetime.timezone.utc)
+
+
+def format_key(when, suffix="0"):
+    """
+    Synthesizes a page key for a point in time.
+    :param when: datetime, str or int
+    :param suffix: key suffix
+    :return: str
+    """
+    dt = to_datetime(when)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S") + f".{dt.microsecond // 1000:03d}Z_{suffix}"
+
+
+def start_key(when):
+    """
+    Synthesizes the startkey of a walk beginning at a point in time.
+    Creation times have second precision so the key lies just past `when` to include items created on it.
+    :param when: datetime, str or int
+    :return: str
+    """
+    return format_key(to_datetime(when) + datetime.timedelta(seconds=1))
+
+
+def key_time(key):
+    """
+    Returns the time of a page key, or None when it is not timestamp based.
+    :param key: page key
+    :return: datetime.datetime or None
+    """
+    try:
+        return to_datetime(key) if key else None
+    except (ValueError, TypeError):
+        return None
+
+
+def item_time(item):
+    """
+    Returns the creation time of a post or comment, or None when it has none.
+    :param item: decoded item
+    :return: datetime.datetime or None
+    """
+    created_at = item.get("createdAt") if isinstance(item, dict) else None
+    if not created_at:
+        return None
+    try:
+        return to_datetime(created_at)
+    except ValueError:
+        return None
@@ -1,10 +1,111 @@
+import atexit
+import datetime
+import gzip
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import shutil
 import sys
+import threading
 
 logger = logging.getLogger('log')
 
+# Handlers added by setup_handlers keyed by destination, so each destination is only written once.
+_handlers = {}
+_handlers_lock = threading.Lock()
+# Handlers fed from the queue by the background listener.
+_background = []
+_queue = queue.Queue(maxsize=100000)
+_listener = None
 
-def setup_handlers(log_stdout=True, log_file=None, log_level=None):
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as JSON lines. Logged dicts and lists, like response bodies, are embedded as JSON.
+    """
+
+    def format(self, record):
+        message = record.msg if isinstance(record.msg, (dict, list)) and not record.args else record.getMessage()
+        line = {"time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+                "level": record.levelname, "message": message}
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the background listener without formatting them and drops them when the queue is full
+    rather than blocking the logging thread.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, records don't need to be made picklable.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _QueueHandler.dropped += 1
+
+
+_queue_handler = _QueueHandler(_queue)
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _file_handler(log_file, max_bytes=0, when=None, backup_count=5, compress=False):
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(log_file, when=when, backupCount=backup_count)
+    elif max_bytes:
+        handler = logging.handlers.RotatingFileHandler(log_file, mode='a+', maxBytes=max_bytes,
+                                                       backupCount=backup_count)
+    else:
+        return logging.FileHandler(filename=log_file, mode='a+')
+    if compress:
+        handler.namer = lambda name: name + ".gz"
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def _restart_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(_queue, *_background, respect_handler_level=True)
+    _listener.start()
+    if _queue_handler not in logger.handlers:
+        logger.addHandler(_queue_handler)
+
+
+def setup_handlers(log_stdout=True, log_file=None, log_level=None, json_lines=False, max_bytes=0, when=None,
+                   backup_count=5, compress=False, background=True):
+    """
+    Sets the log level and adds the stdout and file handlers that are not already installed.
+    Calling it again with the same destinations adds no handlers.
+
+    By default records are handed to a background thread through a bounded queue, so formatting and writing
+    never block the thread that logs. Records are dropped rather than waited for when the queue is full.
+    :param log_stdout: log to stdout
+    :param log_file: log to this file
+    :param log_level: "DEBUG", "INFO", "WARNING" or "CRITICAL", defaults to INFO
+    :param json_lines: write new handlers' records as JSON lines
+    :param max_bytes: rotate the log file once it reaches this size
+    :param when: rotate the log file on time instead, e.g. "midnight" or "H", see TimedRotatingFileHandler
+    :param backup_count: number of rotated files kept
+    :param compress: gzip rotated files
+    :param background: write from a background thread
+    :return:
+    """
     # print(log_level)
     if log_level == "INFO":
         logger.setLevel(logging.INFO)
@@ -17,12 +118,57 @@ def setup_handlers(log_stdout=True, log_file=None, log_level=None):
     else:
         logger.setLevel(logging.INFO)
 
-    if log_stdout:
-        stdout_handler = logging.StreamHandler(sys.stdout)
+    with _handlers_lock:
+        added = []
+        if log_stdout and "stdout" not in _handlers:
+            stdout_handler = logging.StreamHandler(sys.stdout)
+
+            _handlers["stdout"] = stdout_handler
+            added.append(stdout_handler)
+
+        if log_file and os.path.abspath(log_file) not in _handlers:
+            file_handler = _file_handler(log_file, max_bytes, when, backup_count, compress)
+
+            _handlers[os.path.abspath(log_file)] = file_handler
+            added.append(file_handler)
+
+        for handler in added:
+            if json_lines:
+                handler.setFormatter(JsonFormatter())
+            if background:
+                _background.append(handler)
+            else:
+                logger.addHandler(handler)
+        if background and added:
+            _restart_listener()
+
+
+def flush_handlers():
+    """
+    Waits until the background thread has written every queued record.
+    :return:
+    """
+    with _handlers_lock:
+        if _listener is not None:
+            _restart_listener()
+
 
-        logger.addHandler(stdout_handler)
+def close_handlers():
+    """
+    Writes the queued records and removes every handler added by setup_handlers.
+    :return:
+    """
+    global _listener
+    with _handlers_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        logger.removeHandler(_queue_handler)
+        for handler in _handlers.values():
+            logger.removeHandler(handler)
+            handler.close()
+        _handlers.clear()
+        _background.clear()
 
-    if log_file:
-        file_handler = logging.FileHandler(filename=log_file, mode='a+')
 
-        logger.addHandler(file_handler)
+atexit.register(close_handlers)
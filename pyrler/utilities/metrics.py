@@ -0,0 +1,238 @@
+import bisect
+import collections
+import http.server
+import os
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ITEM_BUCKETS = (0, 1, 5, 10, 20, 50, 100, 200, 500)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "pyrler_requests_total": ("counter", "Responses received.", None),
+    "pyrler_request_errors_total": ("counter", "Requests that raised instead of returning a response.", None),
+    "pyrler_request_duration_seconds": ("histogram", "Request latency including retries.", LATENCY_BUCKETS),
+    "pyrler_retries_total": ("counter", "Retried attempts.", None),
+    "pyrler_rate_limited_total": ("counter", "Attempts answered with HTTP 429.", None),
+    "pyrler_response_bytes_total": ("counter", "Response body bytes received.", None),
+    "pyrler_request_bytes_total": ("counter", "Request body bytes sent.", None),
+    "pyrler_walk_pages": ("histogram", "Pages fetched per paginated walk.", PAGE_BUCKETS),
+    "pyrler_page_items": ("histogram", "Items per page of a paginated walk.", ITEM_BUCKETS),
+}
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe registry of request and pagination metrics.
+
+    Requests are labelled by method, route and status, walks and pages by the paginated method they belong to.
+    Values are readable in-process with `get` and `snapshot` and exportable in the Prometheus text format with
+    `prometheus`, `write` or `serve`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(float)
+        # (name, labels) -> [bucket counts, sum, count]
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increments a counter.
+        :param name: metric name
+        :param value: increment
+        :param labels: metric labels
+        :return:
+        """
+        with self._lock:
+            self._counters[name, _labels(labels)] += value
+
+    def observe(self, name, value, **labels):
+        """
+        Adds an observation to a histogram.
+        :param name: metric name
+        :param value: observed value
+        :param labels: metric labels
+        :return:
+        """
+        buckets = METRICS[name][2]
+        with self._lock:
+            histogram = self._histograms.get((name, _labels(labels)))
+            if histogram is None:
+                histogram = self._histograms[name, _labels(labels)] = [[0] * len(buckets), 0, 0]
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def record_request(self, method, route, status=None, latency=0, bytes_in=0, bytes_out=0, retries=0,
+                       rate_limited=0, error=None):
+        """
+        Records a request and its response or error.
+        :param method: http method
+        :param route: tapi route
+        :param status: response status code
+        :param latency: seconds spent on the request
+        :param bytes_in: response body size
+        :param bytes_out: request body size
+        :param retries: number of retried attempts
+        :param rate_limited: number of attempts answered with 429
+        :param error: exception raised by the request
+        :return:
+        """
+        if error is not None:
+            self.inc("pyrler_request_errors_total", method=method, route=route, error=type(error).__name__)
+        else:
+            self.inc("pyrler_requests_total", method=method, route=route, status=str(status))
+        self.observe("pyrler_request_duration_seconds", latency, method=method, route=route)
+        if retries:
+            self.inc("pyrler_retries_total", retries, method=method, route=route)
+        if rate_limited:
+            self.inc("pyrler_rate_limited_total", rate_limited, method=method, route=route)
+        self.inc("pyrler_response_bytes_total", bytes_in, method=method, route=route)
+        self.inc("pyrler_request_bytes_total", bytes_out, method=method, route=route)
+
+    def get(self, name, **labels):
+        """
+        Returns the value of a counter, or a dict with the count, sum and bucket counts of a histogram.
+        :param name: metric name
+        :param labels: metric labels
+        :return: float or dict
+        """
+        with self._lock:
+            if METRICS[name][0] == "counter":
+                return self._counters.get((name, _labels(labels)), 0)
+            counts, total, count = self._histograms.get((name, _labels(labels)), [[], 0, 0])
+            return {"count": count, "sum": total, "buckets": dict(zip(METRICS[name][2], counts))}
+
+    def snapshot(self):
+        """
+        Returns every metric value keyed by name and by a tuple of (label, value) pairs.
+        :return: dict
+        """
+        snapshot = collections.defaultdict(dict)
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                snapshot[name][labels] = value
+            for (name, labels), (counts, total, count) in self._histograms.items():
+                snapshot[name][labels] = {"count": count, "sum": total, "buckets": dict(zip(METRICS[name][2], counts))}
+        return dict(snapshot)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def prometheus(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        :return: str
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help, buckets) in METRICS.items():
+                if kind == "counter":
+                    series = [(labels, value) for (n, labels), value in self._counters.items() if n == name]
+                else:
+                    series = [(labels, value) for (n, labels), value in self._histograms.items() if n == name]
+                if not series:
+                    continue
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(series):
+                    if kind == "counter":
+                        lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+                        continue
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_number(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Writes the Prometheus text format to a file atomically, e.g. for the node_exporter textfile collector.
+        :param path: file path
+        :return:
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """
+        Serves the Prometheus text format over HTTP from a daemon thread.
+        :param port: port to listen on, 0 picks a free port
+        :param host: address to listen on
+        :return: http.server.ThreadingHTTPServer, call shutdown() to stop it
+        """
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def attempts(response):
+    """
+    Returns the number of retried attempts and of 429 answers behind a response.
+    :param response: requests.Response
+    :return: retries, rate_limited
+    """
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    history = retries.history if retries is not None else ()
+    rate_limited = sum(1 for attempt in history if attempt.status == 429) + (response.status_code == 429)
+    return len(history), rate_limited
+
+
+def body_size(request):
+    """
+    Returns the size of a prepared request body.
+    """
+    body = getattr(request, "body", None)
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode())
+    if isinstance(body, bytes):
+        return len(body)
+    return int(getattr(request, "headers", {}).get("Content-Length") or 0)
+
+
+# Process-wide registry used by endpoints unless they are given their own.
+registry = Metrics()
@@ -0,0 +1,162 @@
+import io
+import mimetypes
+import os
+import threading
+import uuid
+
+CHUNK_SIZE = 1 << 16
+
+
+class _File:
+    """
+    File part read from disk on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = None
+
+    def read(self, offset, size):
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MultipartEncoder(io.RawIOBase):
+    """
+    multipart/form-data body streamed from its parts instead of being built in memory.
+
+    Files are read in chunks while the body is sent, so memory use does not depend on their size. The body is
+    seekable, urllib3 and the httpx transport rewind it before retrying a request, and its length is known up
+    front so it is sent with a Content-Length rather than chunked.
+    """
+
+    def __init__(self, fields, boundary=None, callback=None, chunk_size=CHUNK_SIZE):
+        """
+        :param fields: dict or list of (name, value) pairs. Values are strings, bytes, or (filename, path) and
+        (filename, path, content type) tuples for files; the content type is guessed from the filename when missing
+        :param boundary: part boundary, random by default
+        :param callback: callable taking the bytes read and the body size, called as the body is sent
+        :param chunk_size: bytes read from a file at a time when iterating
+        """
+        super().__init__()
+        self.boundary = boundary or uuid.uuid4().hex
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self._segments = []
+        self._files = []
+        self._lock = threading.Lock()
+        self._position = 0
+        for name, value in fields.items() if isinstance(fields, dict) else fields:
+            self._add(name, value)
+        self._add_bytes(f"--{self.boundary}--\r\n".encode())
+        self.len = sum(len(segment) if isinstance(segment, bytes) else segment.size for segment in self._segments)
+
+    def _add_bytes(self, data):
+        if self._segments and isinstance(self._segments[-1], bytes):
+            self._segments[-1] += data
+        else:
+            self._segments.append(data)
+
+    def _add(self, name, value):
+        if isinstance(value, tuple):
+            filename, path = value[:2]
+            content_type = value[2] if len(value) > 2 else \
+                mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            part = _File(path)
+            self._files.append(part)
+            self._add_bytes(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                            f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode())
+            self._segments.append(part)
+            self._add_bytes(b"\r\n")
+            return
+        if isinstance(value, str):
+            value = value.encode()
+        self._add_bytes(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode()
+                        + value + b"\r\n")
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def headers(self):
+        """
+        Headers to send with the body.
+        """
+        return {"Content-Type": self.content_type, "Content-Length": str(self.len)}
+
+    def __len__(self):
+        return self.len
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self.len
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def read(self, size=-1):
+        """
+        Reads up to `size` bytes of the body from the current position.
+        :param size: bytes to read, -1 reads the rest of the body
+        :return: bytes
+        """
+        with self._lock:
+            if size is None or size < 0:
+                size = self.len - self._position
+            chunks = []
+            start = 0
+            for segment in self._segments:
+                length = len(segment) if isinstance(segment, bytes) else segment.size
+                offset = self._position - start
+                start += length
+                if size <= 0:
+                    break
+                if offset >= length:
+                    continue
+                count = min(size, length - offset)
+                chunks.append(segment[offset:offset + count] if isinstance(segment, bytes) else
+                              segment.read(offset, count))
+                self._position += count
+                size -= count
+            data = b"".join(chunks)
+        if self.callback is not None and data:
+            self.callback(self._position, self.len)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        for part in self._files:
+            part.close()
+        super().close()
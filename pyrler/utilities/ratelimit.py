@@ -0,0 +1,148 @@
+import contextlib
+import json
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+GLOBAL = "*"
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter with a global budget and optional per-route budgets.
+
+    Rates are requests per second. By default a 429 response halves the rate of the global bucket and of the route's
+    bucket and pauses them for the duration of its Retry-After header. Each successful response recovers a
+    fraction of the configured rate.
+
+    The limiter is thread-safe. When `path` is given the bucket state is kept in that file under an exclusive
+    lock so limiters with the same path share their budget across processes on one host.
+    """
+
+    def __init__(self, rate=5.0, burst=None, routes=None, path=None, decrease=0.5, recovery=0.02, min_rate=0.1):
+        """
+        :param rate: global requests per second
+        :param burst: global bucket size, defaults to `rate`
+        :param routes: dict of route to requests per second, or to a (rate, burst) tuple
+        :param path: state file shared by cooperating processes
+        :param decrease: factor applied to the rate on a 429 response
+        :param recovery: fraction of the configured rate recovered on each successful response
+        :param min_rate: lower bound for tightened rates
+        """
+        if path and fcntl is None:
+            raise RuntimeError("Sharing a RateLimiter across processes requires fcntl.")
+        self.limits = {GLOBAL: (rate, burst or max(rate, 1))}
+        for route, limit in (routes or {}).items():
+            route_rate, route_burst = limit if isinstance(limit, tuple) else (limit, None)
+            self.limits[route] = (route_rate, route_burst or max(route_rate, 1))
+        self.path = path
+        self.decrease = decrease
+        self.recovery = recovery
+        self.min_rate = min_rate
+        self._lock = threading.Lock()
+        self._state = {}
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            if not self.path:
+                yield self._state
+                return
+
+            with open(self.path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    state = json.loads(raw) if raw else {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _buckets(self, state, route, now):
+        """
+        Returns the refilled buckets governing a route keyed by their name.
+        Buckets are lists of [tokens, updated, rate, paused_until].
+        """
+        buckets = {}
+        for name in (GLOBAL, route):
+            if name not in self.limits or name in buckets:
+                continue
+            rate, burst = self.limits[name]
+            bucket = state.setdefault(name, [burst, now, rate, 0])
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * bucket[2])
+            bucket[1] = now
+            buckets[name] = bucket
+        return buckets
+
+    def reserve(self, route=GLOBAL):
+        """
+        Takes a token for a route if one is available.
+        :param route: tapi route
+        :return: 0 when a token was taken, otherwise the number of seconds to wait before trying again
+        """
+        with self._locked() as state:
+            now = time.time()
+            buckets = self._buckets(state, route, now)
+            wait = 0
+            for tokens, _, rate, paused_until in buckets.values():
+                wait = max(wait, paused_until - now, (1 - tokens) / rate)
+            if wait <= 0:
+                for bucket in buckets.values():
+                    bucket[0] -= 1
+            return max(wait, 0)
+
+    def acquire(self, route=GLOBAL):
+        """
+        Blocks until a request to a route fits the budget.
+        :param route: tapi route
+        :return:
+        """
+        wait = self.reserve(route)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.reserve(route)
+
+    def penalize(self, route=GLOBAL, retry_after=None):
+        """
+        Tightens the budget of a route after a 429 response.
+        :param route: tapi route
+        :param retry_after: seconds the server asked us to wait
+        :return:
+        """
+        with self._locked() as state:
+            now = time.time()
+            for bucket in self._buckets(state, route, now).values():
+                bucket[0] = min(bucket[0], 0)
+                bucket[2] = max(self.min_rate, bucket[2] * self.decrease)
+                if retry_after:
+                    bucket[3] = max(bucket[3], now + retry_after)
+
+    def reward(self, route=GLOBAL):
+        """
+        Loosens a tightened budget after a successful response.
+        :param route: tapi route
+        :return:
+        """
+        with self._locked() as state:
+            now = time.time()
+            for name, bucket in self._buckets(state, route, now).items():
+                rate = self.limits[name][0]
+                bucket[2] = min(rate, bucket[2] + rate * self.recovery)
+
+    def rate(self, route=GLOBAL):
+        """
+        Returns the current rate of a route's most restrictive bucket.
+        :param route: tapi route
+        :return: requests per second
+        """
+        with self._locked() as state:
+            return min(bucket[2] for bucket in self._buckets(state, route, time.time()).values())
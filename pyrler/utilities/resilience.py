@@ -0,0 +1,210 @@
+import collections
+import math
+import threading
+import time
+import requests
+from pyrler.utilities.logger import logger
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """
+    Raised instead of sending a request to a route whose circuit breaker is open.
+    """
+
+
+class AdaptiveTimeout:
+    """
+    Per-route read timeouts derived from a rolling percentile of recent response times.
+
+    Until a route has `min_samples` measurements its timeout is `default`. Afterwards it is the `percentile`
+    of its last `window` response times times `multiplier`, bounded by `min_timeout` and `max_timeout`.
+    Attempts that time out count as response times of the timeout they were given, so a route whose latency
+    rises above its timeout sees the timeout grow instead of failing forever.
+    """
+
+    def __init__(self, default=2, percentile=0.99, multiplier=2, min_timeout=1, max_timeout=30, window=200,
+                 min_samples=20):
+        """
+        :param default: timeout in seconds of routes without enough measurements
+        :param percentile: percentile of response times, between 0 and 1
+        :param multiplier: factor applied to the percentile
+        :param min_timeout: lower bound in seconds
+        :param max_timeout: upper bound in seconds
+        :param window: number of response times kept per route
+        :param min_samples: number of response times needed before adapting
+        """
+        self.default = default
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.window = window
+        self.min_samples = min_samples
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def observe(self, route, seconds):
+        """
+        Records the response time of a request.
+        :param route: tapi route
+        :param seconds: response time
+        :return:
+        """
+        with self._lock:
+            self._latencies[route].append(seconds)
+
+    def timed_out(self, route, timeout, attempts=1):
+        """
+        Records attempts that timed out as response times of their timeout.
+        :param route: tapi route
+        :param timeout: timeout in seconds the attempts were given
+        :param attempts: number of attempts that timed out
+        :return:
+        """
+        with self._lock:
+            self._latencies[route].extend([timeout] * attempts)
+
+    def timeout(self, route):
+        """
+        Returns the timeout in seconds for the next request to a route.
+        :param route: tapi route
+        :return: float
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(route, ()))
+        if len(latencies) < self.min_samples:
+            return self.default
+        index = min(len(latencies) - 1, math.ceil(self.percentile * len(latencies)) - 1)
+        return min(max(latencies[index] * self.multiplier, self.min_timeout), self.max_timeout)
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of the requests sent over a sliding time window.
+
+    Once the budget is spent, requests fail on their first error instead of multiplying the load on a struggling
+    API. `min_retries` keeps retries available when there is little traffic.
+    """
+
+    def __init__(self, ratio=0.1, min_retries=10, window=10):
+        """
+        :param ratio: retries allowed per request sent
+        :param min_retries: retries always allowed per window
+        :param window: window length in seconds
+        """
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._requests = collections.deque()
+        self._retries = collections.deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        for events in (self._requests, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+
+    def request(self):
+        """
+        Records a request.
+        :return:
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._requests.append(now)
+
+    def withdraw(self):
+        """
+        Takes one retry from the budget.
+        :return: False when the budget is spent
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if len(self._retries) >= max(self.min_retries, self.ratio * len(self._requests)):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    Per-route circuit breaker.
+
+    After `failures` consecutive failed requests to a route its circuit opens and requests fail fast with
+    CircuitOpen. After `recovery` seconds a single probe request is let through: its success closes the circuit,
+    its failure opens it for another `recovery` seconds.
+    """
+
+    def __init__(self, failures=5, recovery=30):
+        """
+        :param failures: consecutive failures opening the circuit
+        :param recovery: seconds before an open circuit is probed
+        """
+        self.failures = failures
+        self.recovery = recovery
+        # route -> [consecutive failures, opened_at, probing]
+        self._routes = collections.defaultdict(lambda: [0, None, False])
+        self._lock = threading.Lock()
+
+    def state(self, route):
+        """
+        Returns "closed", "open" or "half-open".
+        :param route: tapi route
+        :return: str
+        """
+        with self._lock:
+            _, opened_at, probing = self._routes[route]
+        if opened_at is None:
+            return "closed"
+        return "half-open" if probing or time.monotonic() - opened_at >= self.recovery else "open"
+
+    def allow(self, route):
+        """
+        Raises CircuitOpen unless a request to a route may be sent.
+        :param route: tapi route
+        :return:
+        """
+        with self._lock:
+            circuit = self._routes[route]
+            _, opened_at, probing = circuit
+            if opened_at is None:
+                return
+            if not probing and time.monotonic() - opened_at >= self.recovery:
+                circuit[2] = True
+                logger.info(f"Probing circuit of {route}.")
+                return
+        raise CircuitOpen(f"Circuit of {route} is open.")
+
+    def abandon(self, route):
+        """
+        Releases the probe of a request allowed by `allow` that ended without an outcome, e.g. a cancelled task.
+        An abandoned probe keeps the circuit open for another `recovery` seconds, other requests are not counted.
+        :param route: tapi route
+        :return:
+        """
+        with self._lock:
+            circuit = self._routes[route]
+            if circuit[2]:
+                circuit[1:] = [time.monotonic(), False]
+
+    def record(self, route, success):
+        """
+        Records the outcome of a request allowed by `allow`.
+        :param route: tapi route
+        :param success: False for connection errors, timeouts and 5xx responses
+        :return:
+        """
+        with self._lock:
+            circuit = self._routes[route]
+            if success:
+                if circuit[1] is not None:
+                    logger.info(f"Closed circuit of {route}.")
+                circuit[:] = [0, None, False]
+                return
+            circuit[0] += 1
+            if circuit[2] or circuit[0] >= self.failures:
+                if circuit[1] is None or circuit[2]:
+                    logger.warning(f"Opened circuit of {route} after {circuit[0]} failures.")
+                circuit[1:] = [time.monotonic(), False]
@@ -0,0 +1,59 @@
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Keys holding the items of a page, in order of preference.
+ITEM_KEYS = ("posts", "comments", "followers", "followees", "users", "news", "hashtags", "notifications",
+             "conversations", "messages", "words")
+
+
+class ParlerResponse(requests.Response):
+    """
+    requests.Response that decodes its JSON body once, with orjson when it is installed.
+    Repeated calls to json() return the same object.
+    """
+
+    def json(self, **kwargs):
+        if kwargs:
+            return super().json(**kwargs)
+        try:
+            return self._json
+        except AttributeError:
+            pass
+
+        if orjson is not None and (self.encoding or "utf-8").lower().replace("-", "") == "utf8":
+            try:
+                self._json = orjson.loads(self.content)
+            except orjson.JSONDecodeError:
+                # Let requests raise its own error type.
+                self._json = super().json()
+        else:
+            self._json = super().json()
+        return self._json
+
+
+def wrap(response):
+    """
+    Turns a requests.Response into a ParlerResponse in place.
+    :param response: requests.Response
+    :return: ParlerResponse
+    """
+    if not isinstance(response, ParlerResponse):
+        response.__class__ = ParlerResponse
+    return response
+
+
+def items(body):
+    """
+    Returns the list of items (posts, comments, users, ...) of a decoded page.
+    :param body: decoded JSON body
+    :return: list
+    """
+    if isinstance(body, dict):
+        for key in ITEM_KEYS:
+            if isinstance(body.get(key), list):
+                return body[key]
+    return []
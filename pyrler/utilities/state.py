@@ -0,0 +1,75 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class _Store:
+    """
+    Thread-safe key/value table in a SQLite database.
+    """
+
+    table = None
+
+    def __init__(self, path):
+        """
+        :param path: SQLite database file, ":memory:" keeps the state in memory
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT, updated_at REAL)")
+
+    @staticmethod
+    def key(func, args, kwargs):
+        """
+        Returns the key of a paginated call from its method and arguments, ignoring pagination arguments.
+        :param func: undecorated endpoint method
+        :param args: positional arguments without self
+        :param kwargs: keyword arguments
+        :return: str
+        """
+        params = {k: v for k, v in kwargs.items() if k not in ("startkey", "endkey", "follow") and v is not None}
+        return json.dumps([func.__qualname__, list(args), params], sort_keys=True, default=str)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._db.execute(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)", (key, value, time.time()))
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def close(self):
+        self._db.close()
+
+
+class CheckpointStore(_Store):
+    """
+    Records the `next` key of the last processed page of each paginated walk so it can be resumed.
+    Finished walks are forgotten.
+    """
+
+    table = "checkpoints"
+
+
+class MediaStore(_Store):
+    """
+    Records the content-addressed file each downloaded media URL was stored as.
+    """
+
+    table = "media"
+
+
+class SyncStore(_Store):
+    """
+    Records the newest items of each paginated walk so the next sync only fetches what was created since.
+    """
+
+    table = "sync"
@@ -0,0 +1,185 @@
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Hook names and the arguments hooks are called with.
+HOOKS = {
+    "before_request": ("method", "route", "kwargs"),
+    "after_response": ("method", "route", "response", "elapsed"),
+    "on_retry": ("method", "route", "attempt"),
+    "on_page": ("walk", "response", "number", "elapsed"),
+    "on_item": ("walk", "item"),
+    "on_walk": ("walk", "pages", "elapsed"),
+}
+
+
+def hooked(target, name):
+    """
+    Returns True if an endpoint has hooks registered for an event.
+    """
+    hooks = getattr(target, "hooks", None)
+    return bool(hooks and hooks.get(name))
+
+
+def fire(target, name, *args):
+    """
+    Calls the hooks an endpoint has registered for an event.
+    :param target: endpoint object
+    :param name: one of HOOKS
+    :param args: hook arguments
+    :return:
+    """
+    hooks = getattr(target, "hooks", None)
+    if hooks:
+        for hook in hooks.get(name, ()):
+            hook(*args)
+
+
+class Tracer:
+    """
+    Records requests, pages and walks as spans and exports them in the Chrome trace event format, viewable in
+    chrome://tracing or https://ui.perfetto.dev.
+
+    Request spans are split into the wait for the response headers and the transfer of the body, followed by the
+    JSON decode. requests does not expose DNS, connect and TLS timings separately, they are part of the wait.
+    Spans are nested by time on the thread that recorded them.
+    """
+
+    def __init__(self, max_events=1000000):
+        """
+        :param max_events: number of events kept, older events are dropped first
+        """
+        self.events = collections.deque(maxlen=max_events)
+        self.samples = collections.Counter()
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._profiler = None
+
+    def _ts(self, when):
+        return round((when - self._origin) * 1e6, 1)
+
+    def _complete(self, name, cat, started, ended, **args):
+        self.events.append({"name": name, "cat": cat, "ph": "X", "ts": self._ts(started),
+                            "dur": round((ended - started) * 1e6, 1), "pid": self._pid,
+                            "tid": threading.get_ident(), "args": args})
+
+    def install(self, endpoint):
+        """
+        Registers the tracer's hooks on an endpoint.
+        :param endpoint: endpoint object
+        :return: endpoint
+        """
+        for name in ("after_response", "on_retry", "on_page", "on_walk"):
+            endpoint.add_hook(name, getattr(self, name))
+        return endpoint
+
+    @contextlib.contextmanager
+    def span(self, name, cat="call", **args):
+        """
+        Records the enclosed block as a span, e.g. around a call to an endpoint method.
+        :param name: span name
+        :param cat: span category
+        :param args: span arguments
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._complete(name, cat, started, time.perf_counter(), **args)
+
+    def after_response(self, method, route, response, elapsed):
+        ended = time.perf_counter()
+        started = ended - elapsed
+        self._complete(f"{method} {route}", "request", started, ended, status=response.status_code,
+                       bytes=len(response.content), cached=getattr(response, "from_cache", False))
+        wait = response.elapsed.total_seconds() if response.elapsed else 0
+        if 0 < wait < elapsed:
+            self._complete("wait", "request", started, started + wait)
+            self._complete("transfer", "request", started + wait, ended)
+        decode_started = time.perf_counter()
+        try:
+            response.json()
+        except ValueError:
+            return
+        self._complete("json", "decode", decode_started, time.perf_counter())
+
+    def on_retry(self, method, route, attempt):
+        self.events.append({"name": f"retry {route}", "cat": "retry", "ph": "i", "s": "t",
+                            "ts": self._ts(time.perf_counter()), "pid": self._pid, "tid": threading.get_ident(),
+                            "args": {"status": attempt.status, "error": repr(attempt.error) if attempt.error else None}})
+
+    def on_page(self, walk, response, number, elapsed):
+        ended = time.perf_counter()
+        self._complete(f"page {number}", "page", ended - elapsed, ended, walk=walk)
+
+    def on_walk(self, walk, pages, elapsed):
+        ended = time.perf_counter()
+        self._complete(walk, "walk", ended - elapsed, ended, pages=pages)
+
+    def start_profiler(self, interval=0.01):
+        """
+        Starts sampling the stacks of every thread in the background.
+        :param interval: seconds between samples
+        :return:
+        """
+        if self._profiler is not None:
+            return
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(interval, stop), daemon=True)
+        self._profiler = (sampler, stop)
+        sampler.start()
+
+    def stop_profiler(self):
+        """
+        Stops the sampling profiler.
+        :return:
+        """
+        if self._profiler is None:
+            return
+        sampler, stop = self._profiler
+        stop.set()
+        sampler.join()
+        self._profiler = None
+
+    def _sample(self, interval, stop):
+        own = threading.get_ident()
+        while not stop.wait(interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:"
+                                 f"{frame.f_code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def chrome_trace(self):
+        """
+        Returns the recorded spans in the Chrome trace event format.
+        :return: dict
+        """
+        return {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """
+        Writes the recorded spans as Chrome trace JSON.
+        :param path: file path
+        :return:
+        """
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def write_profile(self, path):
+        """
+        Writes the profiler samples as folded stacks, readable by flamegraph.pl and https://www.speedscope.app.
+        :param path: file path
+        :return:
+        """
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
@@ -0,0 +1,68 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def stream(tasks, work, concurrency=8, buffer=1000):
+    """
+    Runs `work(task, emit)` for every task on a pool of threads and yields the values passed to `emit` as they
+    arrive.
+
+    At most `buffer` values wait for the consumer; workers block in `emit` until there is room, so memory stays
+    bounded however much the tasks produce. `emit` returns False once the consumer has stopped iterating and
+    workers should give up. An exception raised by `work` stops the pool and is raised to the consumer.
+    :param tasks: iterable of tasks, consumed lazily
+    :param work: callable taking a task and the emit callable
+    :param concurrency: number of worker threads
+    :param buffer: maximum number of values waiting for the consumer
+    :return: generator of emitted values
+    """
+    results = queue.Queue(maxsize=buffer)
+    stop = threading.Event()
+    lock = threading.Lock()
+    tasks = iter(tasks)
+
+    def emit(value):
+        while not stop.is_set():
+            try:
+                results.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def worker():
+        try:
+            while not stop.is_set():
+                with lock:
+                    task = next(tasks, _DONE)
+                if task is _DONE:
+                    break
+                work(task, emit)
+        except BaseException as e:
+            emit(_Failure(e))
+        finally:
+            emit(_DONE)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        finished = 0
+        while finished < len(threads):
+            value = results.get()
+            if value is _DONE:
+                finished += 1
+            elif isinstance(value, _Failure):
+                raise value.error
+            else:
+                yield value
+    finally:
+        stop.set()
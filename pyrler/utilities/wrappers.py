@@ -1,59 +1,416 @@
+import collections
+import datetime
+import functools
+import json
+import time
 from pyrler.utilities.logger import logger
+from pyrler.utilities.keys import format_key, item_time, key_time, start_key, to_datetime
+from pyrler.utilities.response import items
+from pyrler.utilities.tracing import fire, hooked
+from pyrler.utilities.workers import stream
+
+_SHARD_END = object()
+# Number of newest item IDs a SyncStore remembers per walk.
+SYNC_IDS = 100
 
 
 def _yolo_timestamp(response):
     pass
 
 
+def _pagination_bounds(kwargs):
+    """
+    Pops the pagination arguments off the keyword arguments of a paginated call.
+    :param kwargs: keyword arguments of the paginated call
+    :return: startkey, endkey
+    """
+    # Start at user defined index otherwise get the most recent page.
+    startkey = kwargs.pop("startkey", None)
+
+    # End at the user defined index otherwise go back as far as possible.
+    endkey = kwargs.pop("endkey", None)
+
+    return startkey, endkey
+
+
+def _next_startkey(startkey, endkey, body):
+    """
+    Returns the startkey of the page following `body` or None when pagination should stop.
+    :param startkey: startkey used to request the current page
+    :param endkey: user defined endkey
+    :param body: decoded JSON body of the current page
+    :return: str or None
+    """
+    # Break on the last page.
+    if body.get("last"):
+        logger.debug("Found last page.")
+        return None
+
+    # Break if the endpoint doesn't return a next page index.
+    if not body.get("next"):
+        logger.debug("Next page not returned.")
+        return None
+
+    # Break if the next value of the current request is the same as startkey from the last request.
+    # urllib3.util.retry uses Retry with incremental back off and transparently handles HTTP errors
+    # and rate-limit.  If the next param is the same as the previous value it means we performed two
+    # iterations of the incremental backoff limit and something is broken.
+    # This prevents the while loop from looping forever.
+    if startkey == body.get("next"):
+        logger.debug("Next page could not be returned. Check requests debug log.")
+        return None
+
+    if endkey is not None and body.get("next") < endkey:
+        logger.debug("Next page is earlier than endkey!")
+        return None
+
+    return body.get("next")
+
+
+def _walk(func, args, kwargs, checkpoint=None, resume=False):
+    """
+    Yields the pages of a paginated call as they arrive.
+    A page is checkpointed once the consumer asks for the following one.
+    """
+    startkey, endkey = _pagination_bounds(kwargs)
+    if checkpoint is not None:
+        key = checkpoint.key(func, args[1:], kwargs)
+        if resume and checkpoint.get(key):
+            startkey = checkpoint.get(key)
+            logger.debug(f"Resuming from {startkey}.")
+    endpoint = args[0] if args else None
+    metrics = getattr(endpoint, "metrics", None)
+    walk = func.__qualname__
+    pages = 0
+    walk_started = time.perf_counter()
+
+    # Fetch pages until we've got them or something breaks.
+    try:
+        while True:
+            started = time.perf_counter()
+            r = func(startkey=startkey, *args, **kwargs)
+            pages += 1
+            if metrics is not None:
+                metrics.observe("pyrler_page_items", len(items(r.json())), walk=walk)
+            fire(endpoint, "on_page", walk, r, pages, time.perf_counter() - started)
+            if hooked(endpoint, "on_item"):
+                for item in items(r.json()):
+                    fire(endpoint, "on_item", walk, item)
+            yield r
+
+            startkey = _next_startkey(startkey, endkey, r.json())
+            if startkey is None:
+                if checkpoint is not None:
+                    checkpoint.delete(key)
+                break
+            if checkpoint is not None:
+                checkpoint.set(key, startkey)
+    finally:
+        if metrics is not None and pages:
+            metrics.observe("pyrler_walk_pages", pages, walk=walk)
+        if pages:
+            fire(endpoint, "on_walk", walk, pages, time.perf_counter() - walk_started)
+
+
 def paginate(func):
+    """
+    Adds pagination to an endpoint method.
+
+    With follow=True the method walks every page and returns the list of responses.
+    With stream="pages" or stream="items" it returns a generator of responses or of the items (posts, comments,
+    users, ...) of each page instead, fetching the next page only when the previous one has been consumed.
+    `items_key` selects the list of items when the default guess is wrong.
+
+    Passing a CheckpointStore as `checkpoint` records the progress of the walk; resume=True restarts an
+    interrupted walk with the same arguments from its last processed page.
+
+    `since` and `until` bound a timestamp keyed walk by time instead of by page key. Item streams are trimmed
+    to the requested window, so they never contain items created before `since`/`endkey` or after
+    `until`/`startkey`.
+
+    shards=N splits the time range from `since` to `until` (default now) into N shards walked concurrently
+    and returns their items newest first without duplicates, as a list or with stream="items" as a generator.
+
+    Passing a SyncStore as `sync` records the newest items of a walk of the newest first items; incremental=True
+    then stops the walk at the first item already recorded and returns only the new items, as a list or with
+    stream="items" as a generator.
+    """
+    @functools.wraps(func)
     def func_wrapper(*args, **kwargs):
+        stream = kwargs.pop("stream", None)
+        items_key = kwargs.pop("items_key", None)
+        checkpoint = kwargs.pop("checkpoint", None)
+        resume = kwargs.pop("resume", False)
+        shards = kwargs.pop("shards", None)
+        sync = kwargs.pop("sync", None)
+        incremental = kwargs.pop("incremental", False)
+        if incremental and sync is None:
+            raise ValueError("incremental=True requires a SyncStore as sync")
+        if sync is not None and stream == "pages":
+            raise ValueError("sync returns items, use stream='items'")
+        if shards:
+            if not kwargs.get("since"):
+                raise ValueError("shards requires since, the start of the time range to split")
+            if stream == "pages":
+                raise ValueError("shards returns items, use stream='items'")
+            since, until = kwargs.pop("since"), kwargs.pop("until", None)
+            merged = _sharded(func, args, kwargs, shards, since, until, items_key)
+            return merged if stream == "items" else list(merged)
+        if kwargs.get("until"):
+            kwargs["startkey"] = start_key(kwargs.pop("until"))
+        if kwargs.get("since"):
+            kwargs["endkey"] = format_key(kwargs.pop("since"))
+        kwargs.pop("until", None)
+        kwargs.pop("since", None)
+        if stream:
+            kwargs["follow"] = True
+        if sync is not None:
+            kwargs["follow"] = True
+            new = _synced(func, args, kwargs, sync, incremental, items_key, checkpoint, resume)
+            return new if stream == "items" else list(new)
         if kwargs.get("follow"):
-            data = []
-            # Start at user defined index otherwise get the most recent page.
-            if kwargs.get("startkey"):
-                startkey = kwargs.get("startkey")
-            else:
-                startkey = None
+            pages = _walk(func, args, kwargs, checkpoint=checkpoint, resume=resume)
+            if stream == "pages":
+                return pages
+            elif stream == "items":
+                lower, upper = key_time(kwargs.get("endkey")), key_time(kwargs.get("startkey"))
+                return (item for r in pages for item in _trim(_page_items(r, items_key), lower, upper))
+            elif stream:
+                raise ValueError(f"stream must be 'pages' or 'items', not {stream!r}")
+            return list(pages)
+        else:
+            # A single page starts at `until`, there's no further page for `since` to stop at.
+            kwargs.pop("endkey", None)
+            return func(*args, **kwargs)
 
-            # End at the user defined index otherwise go back as far as possible.
-            if "endkey" in kwargs:
-                endkey = kwargs.get("endkey")
-                del kwargs["endkey"]
-            else:
-                endkey = None
+    func_wrapper.paginated = func
+    return func_wrapper
 
-            # Fetch pages until we've got them or something breaks.
-            while True:
-                r = func(startkey=startkey, *args, **kwargs)
-                data.append(r)
 
-                # Break on the last page.
-                if r.json().get("last"):
-                    logger.debug("Found last page.")
-                    break
+def _sharded(func, args, kwargs, shards, since, until=None, items_key=None):
+    """
+    Walks the time range from `since` to `until` as `shards` concurrent walks and yields their items in order.
+    Each shard starts from a key synthesized from its upper bound and stops at its lower bound. Items are trimmed
+    to their shard's window so the overlapping edge pages of neighbouring shards are not duplicated.
+    """
+    upper = to_datetime(until or datetime.datetime.now(datetime.timezone.utc))
+    lower = to_datetime(since)
+    step = (upper - lower) / shards
+    bounds = [upper - step * i for i in range(shards)] + [lower]
+    kwargs.pop("startkey", None)
+    kwargs.pop("endkey", None)
+    kwargs["follow"] = True
 
-                # Break if the endpoint doesn't return a next page index.
-                if not r.json().get("next"):
-                    logger.debug("Next page not returned.")
-                    break
+    def work(shard, emit):
+        start, end = bounds[shard], bounds[shard + 1]
+        shard_kwargs = dict(kwargs, startkey=start_key(start), endkey=format_key(end))
+        for r in _walk(func, args, shard_kwargs):
+            for item in _page_items(r, items_key):
+                created_at = item_time(item)
+                if created_at is None or end < created_at <= start or (shard == shards - 1 and created_at == end):
+                    if not emit((shard, item)):
+                        return
+        emit((shard, _SHARD_END))
 
-                # Break if the next value of the current request is the same as startkey from the last request.
-                # urllib3.util.retry uses Retry with incremental back off and transparently handles HTTP errors
-                # and rate-limit.  If the next param is the same as the previous value it means we performed two
-                # iterations of the incremental backoff limit and something is broken.
-                # This prevents the while loop from looping forever.
-                if startkey == r.json().get("next"):
-                    logger.debug("Next page could not be returned. Check requests debug log.")
+    # Yield the newest shard live and hold back the items of older shards until it is done.
+    current = 0
+    held = collections.defaultdict(list)
+    for shard, item in stream(range(shards), work, concurrency=shards):
+        if shard != current:
+            held[shard].append(item)
+            continue
+        if item is not _SHARD_END:
+            yield item
+            continue
+        current += 1
+        while current < shards:
+            for item in held.pop(current, []):
+                if item is _SHARD_END:
                     break
+                yield item
+            else:
+                break
+            current += 1
+
+
+def _item_id(item):
+    if isinstance(item, dict) and (item.get("_id") or item.get("id")):
+        return str(item.get("_id") or item.get("id"))
+    return json.dumps(item, sort_keys=True, default=str)
 
-                if endkey is not None and r.json().get("next") < endkey:
-                    logger.debug("Next page is earlier than endkey!")
+
+def _synced(func, args, kwargs, sync, incremental=False, items_key=None, checkpoint=None, resume=False):
+    """
+    Yields the items of a walk, stopping at the first item recorded by the previous sync when incremental.
+    The newest items are recorded once the walk is done, so an interrupted sync is fetched again in full.
+    Walks starting from a startkey don't see the newest items and are not recorded.
+    """
+    key = sync.key(func, args[1:], kwargs)
+    saved = sync.get(key)
+    state = json.loads(saved) if saved else {"time": None, "ids": []}
+    seen = set(state["ids"])
+    last = newest = key_time(state["time"])
+    lower, upper = key_time(kwargs.get("endkey")), key_time(kwargs.get("startkey"))
+    from_top = kwargs.get("startkey") is None
+    new_ids = []
+
+    pages = _walk(func, args, kwargs, checkpoint=checkpoint, resume=resume)
+    try:
+        for r in pages:
+            page_items = _page_items(r, items_key)
+            reached = False
+            for item in page_items:
+                created_at = item_time(item)
+                if incremental and (_item_id(item) in seen or
+                                    (last is not None and created_at is not None and created_at < last)):
+                    reached = True
                     break
+                if created_at is not None and (newest is None or created_at > newest):
+                    newest = created_at
+                if len(new_ids) < SYNC_IDS:
+                    new_ids.append(_item_id(item))
+                if _trim([item], lower, upper):
+                    yield item
+            if reached:
+                logger.debug("Reached items seen by the last sync.")
+                break
+    finally:
+        pages.close()
 
-                startkey = r.json().get("next")
-            
-            return data
-        else:
-            return func(*args, **kwargs)
+    if from_top:
+        ids = new_ids + [i for i in state["ids"] if i not in new_ids] if incremental else new_ids
+        sync.set(key, json.dumps({"time": format_key(newest) if newest else None, "ids": ids[:SYNC_IDS]}))
+
+
+def _trim(page_items, lower=None, upper=None):
+    """
+    Drops the items created before `lower` or after `upper`. Items without a creation time are kept.
+    """
+    if lower is None and upper is None:
+        return page_items
+    trimmed = []
+    for item in page_items:
+        created_at = item_time(item)
+        if created_at is None or ((lower is None or created_at >= lower) and (upper is None or created_at <= upper)):
+            trimmed.append(item)
+    return trimmed
+
+
+def seek(method, when, max_probes=8, **kwargs):
+    """
+    Returns a startkey from which a timestamp keyed walk begins at a point in time.
+
+    The key is synthesized from `when` and checked with a single page request. Should the endpoint answer
+    with items newer than `when`, the walk is probed forward along its `next` keys, up to `max_probes` pages,
+    until it reaches `when`.
+    :param method: bound paginated method, e.g. pyrler.Post().get_user_posts
+    :param when: datetime, page key or 14 digit creation time
+    :param max_probes: maximum number of pages requested
+    :param kwargs: method arguments
+    :return: str
+    """
+    target = to_datetime(when)
+    startkey = start_key(target)
+    for _ in range(max_probes):
+        body = method(startkey=startkey, **kwargs).json()
+        times = [t for t in map(item_time, _page_items_of(body)) if t is not None]
+        if not times or min(times) <= target or not body.get("next") or body.get("next") == startkey:
+            return startkey
+        logger.debug(f"Page at {startkey} is newer than {target}, probing {body.get('next')}.")
+        startkey = body.get("next")
+    return startkey
+
+
+def _page_items_of(body, items_key=None):
+    if items_key is not None:
+        return body.get(items_key) or []
+    return items(body)
+
+
+def _page_items(response, items_key=None):
+    return _page_items_of(response.json(), items_key)
+
+
+def iter_pages(method, **kwargs):
+    """
+    Returns a generator of the pages of a paginated endpoint method.
+    :param method: bound paginated method, e.g. pyrler.Post().get_user_posts
+    :param kwargs: method arguments
+    :return: generator of requests.Response
+    """
+    return method(stream="pages", **kwargs)
 
+
+def iter_items(method, **kwargs):
+    """
+    Returns a generator of the items of every page of a paginated endpoint method.
+    :param method: bound paginated method, e.g. pyrler.Post().get_user_posts
+    :param kwargs: method arguments
+    :return: generator of dict
+    """
+    return method(stream="items", **kwargs)
+
+
+def async_paginate(func):
+    """
+    Awaitable counterpart of `paginate` for endpoint methods whose requests return coroutines.
+
+    Calls return a coroutine, or with stream="pages" or stream="items" an async generator of responses or items
+    fetching the next page only when the previous one has been consumed. `items_key`, `since` and `until` work
+    as with `paginate`; checkpoints, shards and syncs are only supported by the blocking endpoints.
+    :param func: undecorated endpoint method
+    :return:
+    """
+    @functools.wraps(func)
+    def func_wrapper(*args, **kwargs):
+        unsupported = sorted(k for k in ("checkpoint", "resume", "shards", "sync", "incremental") if kwargs.get(k))
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)}: only supported by the blocking endpoints")
+        stream = kwargs.pop("stream", None)
+        items_key = kwargs.pop("items_key", None)
+        if stream not in (None, "pages", "items"):
+            raise ValueError(f"stream must be 'pages' or 'items', not {stream!r}")
+        if kwargs.get("until"):
+            kwargs["startkey"] = start_key(kwargs.pop("until"))
+        if kwargs.get("since"):
+            kwargs["endkey"] = format_key(kwargs.pop("since"))
+        kwargs.pop("until", None)
+        kwargs.pop("since", None)
+        if stream == "pages":
+            return _async_walk(func, args, kwargs)
+        if stream == "items":
+            lower, upper = key_time(kwargs.get("endkey")), key_time(kwargs.get("startkey"))
+            return _async_items(_async_walk(func, args, kwargs), items_key, lower, upper)
+        return _async_call(func, args, kwargs)
+
+    func_wrapper.paginated = func
     return func_wrapper
+
+
+async def _async_call(func, args, kwargs):
+    if kwargs.get("follow"):
+        return [r async for r in _async_walk(func, args, kwargs)]
+    kwargs.pop("endkey", None)
+    return await func(*args, **kwargs)
+
+
+async def _async_walk(func, args, kwargs):
+    """
+    Yields the pages of an awaitable paginated call as they arrive.
+    """
+    kwargs.pop("follow", None)
+    startkey, endkey = _pagination_bounds(kwargs)
+
+    while True:
+        r = await func(startkey=startkey, *args, **kwargs)
+        yield r
+
+        startkey = _next_startkey(startkey, endkey, r.json())
+        if startkey is None:
+            break
+
+
+async def _async_items(pages, items_key=None, lower=None, upper=None):
+    async for r in pages:
+        for item in _trim(_page_items(r, items_key), lower, upper):
+            yield item
@@ -18,5 +18,10 @@ setup(
     author="Cognitive Security Collaborative",
     author_email="info@cogsec-collab.org",
     packages=find_packages(),
-    install_requires=read_requirements()
+    install_requires=read_requirements(),
+    extras_require={
+        "async": ["aiohttp"],
+        "http2": ["httpx[http2,brotli,zstd]>=0.27"],
+        "speedups": ["orjson", "zstandard"]
+    }
 )
\ No newline at end of file
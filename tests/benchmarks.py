@@ -0,0 +1,188 @@
+"""
+Offline benchmarks against the local mock server.
+
+    python -m tests.benchmarks --pages 200 --page-size 20 --latency 0.002 --output results.json
+    python -m tests.benchmarks --baseline results.json --tolerance 0.2
+
+Each benchmark reports pages/sec, items/sec, p50/p99 request latency and peak traced memory. With --baseline
+the run fails when a result is worse than the baseline by more than the tolerance.
+"""
+import json
+import optparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import pyrler
+from pyrler.core.crawl import crawl_users, CrawlItem
+from pyrler.utilities import client
+from tests.mock_server import MockParler, _post
+
+# Result fields and whether higher values are better.
+FIELDS = {"pages_per_sec": True, "items_per_sec": True, "p50_ms": False, "p99_ms": False, "peak_kb": False}
+
+
+def _percentile(values, percentile):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(percentile * len(values)))]
+
+
+def _measure(name, run, latencies):
+    # Tracing allocations slows everything down, so memory is measured on a second run.
+    started = time.perf_counter()
+    pages, items = run()
+    elapsed = time.perf_counter() - started
+    timed = list(latencies)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies[:] = timed
+    return {"name": name, "pages": pages, "items": items, "seconds": round(elapsed, 3),
+            "pages_per_sec": round(pages / elapsed, 1), "items_per_sec": round(items / elapsed, 1),
+            "p50_ms": round(_percentile(latencies, 0.5) * 1000, 2),
+            "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2), "peak_kb": round(peak / 1024, 1)}
+
+
+def _endpoint(cls, server, latencies):
+    return cls(log_stdout=False, coalesce=False, metrics=None, pool_maxsize=32, parler_url=server.url,
+               hooks={"after_response": lambda method, route, response, elapsed: latencies.append(elapsed)})
+
+
+def bench_paginate_follow(server):
+    latencies = []
+    p = _endpoint(pyrler.Post, server, latencies)
+
+    def run():
+        pages = p.get_user_posts(user_id="1", follow=True)
+        return len(pages), sum(len(r.json()["posts"]) for r in pages)
+
+    return _measure("paginate follow=True", run, latencies)
+
+
+def bench_paginate_stream(server):
+    latencies = []
+    p = _endpoint(pyrler.Post, server, latencies)
+
+    def run():
+        requests = len(latencies)
+        items = sum(1 for _ in p.get_user_posts(user_id="1", stream="items"))
+        return len(latencies) - requests, items
+
+    return _measure("paginate stream=items", run, latencies)
+
+
+def bench_crawl(server, users=8, concurrency=8):
+    latencies = []
+    hooks = {"after_response": lambda method, route, response, elapsed: latencies.append(elapsed)}
+
+    def run():
+        results = crawl_users([str(u) for u in range(users)], endpoints=["posts", "followers"],
+                              concurrency=concurrency, coalesce=False, metrics=None, hooks=hooks,
+                              parler_url=server.url)
+        requests = len(latencies)
+        items = sum(isinstance(result, CrawlItem) for result in results)
+        return len(latencies) - requests, items
+
+    return _measure(f"crawl_users {users} users x2 endpoints", run, latencies)
+
+
+def bench_network(posts=20000):
+    """
+    Times pyrler/utilities/network.py building a mention graph, or returns None without networkx.
+    """
+    try:
+        import networkx  # noqa: F401
+    except ImportError:
+        return None
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyrler", "utilities",
+                          "network.py")
+    with tempfile.TemporaryDirectory() as directory:
+        data = os.path.join(directory, "posts.jsonl")
+        with open(data, "w") as f:
+            for i in range(posts):
+                f.write(json.dumps(_post(str(i % 100), i)) + "\n")
+        started = time.perf_counter()
+        subprocess.run([sys.executable, script, data, os.path.join(directory, "posts.gexf")], check=True)
+        elapsed = time.perf_counter() - started
+    return {"name": f"network.py {posts} posts", "pages": 0, "items": posts, "seconds": round(elapsed, 3),
+            "pages_per_sec": 0, "items_per_sec": round(posts / elapsed, 1), "p50_ms": 0, "p99_ms": 0,
+            "peak_kb": 0}
+
+
+def run(pages=50, page_size=20, latency=0, rate_limit_every=0, network_posts=20000):
+    """
+    Runs every benchmark against a fresh mock server.
+    :return: list of result dicts
+    """
+    results = []
+    with MockParler(latency=latency, page_size=page_size, pages=pages, rate_limit_every=rate_limit_every) as server:
+        for bench in (bench_paginate_follow, bench_paginate_stream, bench_crawl):
+            results.append(bench(server))
+            client.close_sessions()
+    if network_posts:
+        network = bench_network(network_posts)
+        if network is not None:
+            results.append(network)
+    return results
+
+
+def regressions(results, baseline, tolerance=0.2):
+    """
+    Returns descriptions of results worse than their baseline by more than `tolerance`.
+    """
+    previous = {result["name"]: result for result in baseline}
+    found = []
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        for field, higher_is_better in FIELDS.items():
+            if not before[field]:
+                continue
+            change = (result[field] - before[field]) / before[field]
+            if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+                found.append(f"{result['name']}: {field} {before[field]} -> {result[field]}")
+    return found
+
+
+def main():
+    opt_parser = optparse.OptionParser(usage="python -m tests.benchmarks [options]")
+    opt_parser.add_option("--pages", type="int", default=50)
+    opt_parser.add_option("--page-size", dest="page_size", type="int", default=20)
+    opt_parser.add_option("--latency", type="float", default=0)
+    opt_parser.add_option("--rate-limit-every", dest="rate_limit_every", type="int", default=0)
+    opt_parser.add_option("--network-posts", dest="network_posts", type="int", default=20000)
+    opt_parser.add_option("--output", help="write the results to this JSON file")
+    opt_parser.add_option("--baseline", help="compare against results previously written with --output")
+    opt_parser.add_option("--tolerance", type="float", default=0.2)
+    options, _ = opt_parser.parse_args()
+
+    results = run(options.pages, options.page_size, options.latency, options.rate_limit_every,
+                  options.network_posts)
+    print(f"{'benchmark':40} {'pages/s':>10} {'items/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'peak KB':>10}")
+    for r in results:
+        print(f"{r['name']:40} {r['pages_per_sec']:>10} {r['items_per_sec']:>10} {r['p50_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['peak_kb']:>10}")
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if options.baseline:
+        with open(options.baseline) as f:
+            found = regressions(results, json.load(f), options.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Local stand-in for the Parler API serving synthetic, Parler-shaped responses.
+
+    python -m tests.mock_server --port 8080 --latency 0.05 --page-size 20 --rate-limit-every 50
+
+Endpoints created with `parler_url=server.url` walk timestamp keyed pages of posts, comments and
+users like the live API. Recorded bodies can be served instead by passing `responses`.
+"""
+import datetime
+import http.server
+import json
+import optparse
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from pyrler.utilities.keys import CREATED_AT_FORMAT, format_key, key_time
+
+# Creation time of the newest synthetic item; older items are one minute apart.
+EPOCH = datetime.datetime(2021, 1, 8, 12, 0, tzinfo=datetime.timezone.utc)
+
+
+def _user(user_id):
+    return {"id": user_id, "username": f"user_{user_id}", "name": f"User {user_id}", "followers": 0,
+            "following": 0, "bio": "Synthetic user."}
+
+
+def _post(user_id, i):
+    created_at = (EPOCH - datetime.timedelta(minutes=i)).strftime(CREATED_AT_FORMAT)
+    return {"_id": f"{user_id}-post-{i}", "body": f"Synthetic post {i} #pyrler @user_{i % 7}",
+            "createdAt": created_at, "creator": {"id": user_id, "username": f"user_{user_id}"},
+            "hashtags": ["pyrler", f"tag{i % 5}"], "@": {f"user_{i % 7}": str(i % 7)}, "depth": "0",
+            "upvotes": i % 11, "comments": i % 3}
+
+
+def _comment(parent_id, i):
+    created_at = (EPOCH - datetime.timedelta(minutes=i)).strftime(CREATED_AT_FORMAT)
+    return {"_id": f"{parent_id}-comment-{i}", "body": f"Synthetic comment {i}", "createdAt": created_at,
+            "creator": str(i % 13), "parent": parent_id, "depth": "1"}
+
+
+def _follower(user_id, i):
+    return dict(_user(f"{user_id}.{i}"), createdAt=(EPOCH - datetime.timedelta(minutes=i)).strftime(CREATED_AT_FORMAT))
+
+
+# Paginated routes: route -> (items key, item factory)
+PAGINATED = {
+    "/v1/post/creator": ("posts", _post),
+    "/v1/comment": ("comments", _comment),
+    "/v1/comment/creator": ("comments", _comment),
+    "/v1/follow/followers": ("followers", _follower),
+    "/v1/follow/following": ("followees", _follower),
+}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if self.command == "POST":
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.server.mock.uploads.append((url.path, self.headers.get("Content-Type"), body))
+        status, body = self.server.mock.respond(url.path, params)
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class MockParler:
+    """
+    Threaded HTTP server answering like the Parler API.
+    """
+
+    def __init__(self, port=0, latency=0, page_size=20, pages=10, rate_limit_every=0, responses=None):
+        """
+        :param port: port to listen on, 0 picks a free port
+        :param latency: seconds each response is delayed
+        :param page_size: items per page
+        :param pages: pages per walk
+        :param rate_limit_every: answer every nth request with HTTP 429, 0 disables rate limiting
+        :param responses: dict of route to a recorded body or to a callable taking the query parameters and
+        returning (status, body)
+        """
+        self.latency = latency
+        self.page_size = page_size
+        self.pages = pages
+        self.rate_limit_every = rate_limit_every
+        self.responses = responses or {}
+        self.requests = 0
+        self.rate_limited = 0
+        # POSTed (route, content type, body) tuples.
+        self.uploads = []
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, route, params):
+        """
+        Returns the status and body answering a request.
+        :param route: tapi route
+        :param params: query parameters
+        :return: status, body
+        """
+        with self._lock:
+            self.requests += 1
+            limited = self.rate_limit_every and self.requests % self.rate_limit_every == 0
+            if limited:
+                self.rate_limited += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if limited:
+            return 429, {"message": "Too many requests"}
+
+        if route in self.responses:
+            response = self.responses[route]
+            return response(params) if callable(response) else (200, response)
+        if route in PAGINATED:
+            return 200, self.page(route, params.get("id", "0"), params.get("startkey"))
+        if route == "/v1/post":
+            return 200, {"post": _post(params.get("id", "0"), 0)}
+        if route == "/v1/profile":
+            return 200, _user(params.get("id") or params.get("username", "0"))
+        return 404, {"message": "Not found"}
+
+    def page(self, route, parent_id, startkey=None):
+        """
+        Returns the page of a paginated route starting at `startkey`, newest items first.
+        """
+        items_key, factory = PAGINATED[route]
+        total = self.page_size * self.pages
+        start = 0
+        when = key_time(startkey)
+        if when is not None:
+            # Items are one minute apart, start with the first item created at or before the key.
+            start = max(0, -int(-(EPOCH - when).total_seconds() // 60))
+        end = min(start + self.page_size, total)
+        last = end >= total
+        next_key = None if last else format_key(EPOCH - datetime.timedelta(minutes=end), suffix=str(end))
+        return {items_key: [factory(parent_id, i) for i in range(start, end)], "next": next_key, "last": last}
+
+
+def main():
+    opt_parser = optparse.OptionParser(usage="python -m tests.mock_server [options]")
+    opt_parser.add_option("--port", type="int", default=8080)
+    opt_parser.add_option("--latency", type="float", default=0)
+    opt_parser.add_option("--page-size", dest="page_size", type="int", default=20)
+    opt_parser.add_option("--pages", type="int", default=10)
+    opt_parser.add_option("--rate-limit-every", dest="rate_limit_every", type="int", default=0)
+    options, _ = opt_parser.parse_args()
+    server = MockParler(options.port, options.latency, options.page_size, options.pages, options.rate_limit_every)
+    print(f"Serving on {server.url}")
+    server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
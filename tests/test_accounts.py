@@ -0,0 +1,83 @@
+import http.server
+import json
+import threading
+import unittest
+from pyrler.core import pyrler
+from pyrler.utilities.accounts import AccountPool, NoAccountAvailable
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.command == "POST":
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        mst = self.headers.get("Cookie", "").split("mst=")[1].split(";")[0]
+        self.server.seen.append(mst)
+        status = {"expired": 401, "limited": 429}.get(mst, 200)
+        if "forbidden" in self.path:
+            status = 403
+        body = json.dumps({"account": mst}).encode()
+        self.send_response(status)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAccountPool(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.seen = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _profile(self, pool):
+        p = pyrler.Profile(log_stdout=False, accounts=pool)
+        p.parler_url = f"http://127.0.0.1:{self.server.server_port}"
+        return p
+
+    def test_round_robin(self):
+        p = self._profile(AccountPool([("a", "a"), ("b", "b")]))
+        for _ in range(4):
+            p.get_user_profile(username="user")
+        self.assertEqual(sorted(self.server.seen), ["a", "a", "b", "b"])
+
+    def test_unhealthy_accounts_are_skipped(self):
+        pool = AccountPool([("expired", "x"), ("limited", "x"), ("good", "x")])
+        p = self._profile(pool)
+        for _ in range(3):
+            self.assertEqual(p.get_user_profile(username="user").json(), {"account": "good"})
+        self.assertEqual(pool.healthy(), [pool.accounts[2]])
+
+    def test_forbidden_resources_keep_accounts(self):
+        pool = AccountPool([("a", "x"), ("b", "x"), ("c", "x")])
+        p = self._profile(pool)
+        for _ in range(3):
+            self.assertEqual(p.get_user_profile(username="forbidden").status_code, 403)
+        self.assertEqual(len(self.server.seen), 3)
+        self.assertEqual(len(pool.healthy()), 3)
+
+    def test_mutations_are_not_resent(self):
+        pool = AccountPool([("limited", "x"), ("good", "x")])
+        p = self._profile(pool)
+        self.server.seen = []
+        pool.accounts[1].in_flight = 1
+        self.assertEqual(p._post_request("/v1/post", data={"body": "hello"}).status_code, 429)
+        self.assertEqual(self.server.seen, ["limited"])
+
+    def test_all_evicted(self):
+        p = self._profile(AccountPool([("expired", "x")]))
+        self.assertEqual(p.get_user_profile(username="user").status_code, 401)
+        with self.assertRaises(NoAccountAvailable):
+            p.get_user_profile(username="user")
+
+
+if __name__ == "__main__":
+    unittest.main()
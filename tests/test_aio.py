@@ -0,0 +1,114 @@
+import os
+import asyncio
+import unittest
+import requests
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:
+    web = None
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import aio
+from pyrler.utilities.resilience import CircuitBreaker
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class TestAsyncEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    async def _posts(self, request):
+        self.calls += 1
+        if self.calls == 1:
+            return web.json_response({}, status=429, headers={"Retry-After": "0"})
+        page = int(request.query.get("startkey", "3"))
+        return web.json_response({"posts": [{"_id": str(page)}], "next": str(page - 1), "last": page == 1})
+
+    async def _walk(self, call=None):
+        app = web.Application()
+        app.router.add_get("/v1/post/creator", self._posts)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with aio.AsyncPost(log_stdout=False) as p:
+                p.parler_url = f"http://127.0.0.1:{port}"
+                if call is not None:
+                    return await call(p)
+                return await p.get_user_posts(user_id="user_id", follow=True)
+        finally:
+            await runner.cleanup()
+
+    def test_user_posts_follow(self):
+        out = asyncio.run(self._walk())
+        self.assertEqual([r.json()["posts"][0]["_id"] for r in out], ["3", "2", "1"])
+        self.assertEqual(self.calls, 4)
+
+    def test_user_posts_streams(self):
+        async def items(p):
+            return [post["_id"] async for post in p.get_user_posts(user_id="user_id", stream="items")]
+
+        self.assertEqual(asyncio.run(self._walk(items)), ["3", "2", "1"])
+
+        async def pages(p):
+            stream = p.get_user_posts(user_id="user_id", stream="pages")
+            first = await stream.__anext__()
+            await stream.aclose()
+            return first.json()["posts"]
+
+        self.assertEqual(asyncio.run(self._walk(pages)), [{"_id": "3"}])
+
+    def test_post_read_timeouts_are_not_retried(self):
+        async def slow(request):
+            self.calls += 1
+            await asyncio.sleep(0.5)
+            return web.json_response({})
+
+        async def comment():
+            app = web.Application()
+            app.router.add_post("/v1/comment", slow)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            try:
+                async with aio.AsyncComment(log_stdout=False, metrics=None) as c:
+                    c.parler_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+                    await c.create_comment("parent", "hello", timeout=aiohttp.ClientTimeout(sock_read=0.1))
+            finally:
+                await runner.cleanup()
+
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            asyncio.run(comment())
+        self.assertEqual(self.calls, 1)
+
+    def test_cancelled_probe_is_released(self):
+        breaker = CircuitBreaker(failures=1, recovery=0)
+        breaker.record("/v1/post/creator", False)
+
+        async def cancel(p):
+            p.breaker = breaker
+            task = asyncio.ensure_future(p.get_user_posts(user_id="user_id"))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            breaker.allow("/v1/post/creator")
+
+        asyncio.run(self._walk(cancel))
+
+    def test_blocking_only_arguments_are_rejected(self):
+        p = aio.AsyncPost(log_stdout=False)
+        for kwargs in ({"shards": 4}, {"checkpoint": object()}, {"stream": "posts"}):
+            with self.assertRaises(ValueError):
+                p.get_user_posts(user_id="user_id", **kwargs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import unittest
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import pyrler
+from pyrler.utilities import client
+from tests import benchmarks
+from tests.mock_server import EPOCH, MockParler
+
+
+class TestMockServer(unittest.TestCase):
+    def tearDown(self):
+        client.close_sessions()
+
+    def test_walks_every_page_through_rate_limits(self):
+        with MockParler(page_size=5, pages=4, rate_limit_every=3) as server:
+            p = pyrler.Post(log_stdout=False, coalesce=False, metrics=None, parler_url=server.url)
+            posts = list(p.get_user_posts(user_id="1", stream="items"))
+        self.assertEqual(len(posts), 20)
+        self.assertEqual(len({post["_id"] for post in posts}), 20)
+        self.assertGreater(server.rate_limited, 0)
+
+    def test_time_bounded_walk(self):
+        with MockParler(page_size=5, pages=4) as server:
+            p = pyrler.Post(log_stdout=False, coalesce=False, metrics=None, parler_url=server.url)
+            posts = list(p.get_user_posts(user_id="1", stream="items", until="20210108115500",
+                                          since="20210108114600"))
+        self.assertEqual([post["_id"] for post in posts], [f"1-post-{i}" for i in range(5, 15)])
+        self.assertEqual(EPOCH.strftime("%Y%m%d%H%M%S"), "20210108120000")
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_run(self):
+        results = benchmarks.run(pages=3, page_size=5, network_posts=0)
+        self.assertEqual([r["items"] for r in results], [15, 15, 8 * 2 * 15])
+        self.assertEqual(benchmarks.regressions(results, results), [])
+        slower = [dict(r, pages_per_sec=r["pages_per_sec"] * 2) for r in results]
+        self.assertEqual(len(benchmarks.regressions(results, slower)), len(results))
+
+
+if __name__ == "__main__":
+    unittest.main()
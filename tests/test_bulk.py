@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+from pyrler.core import aio, pyrler
+from pyrler.utilities import client
+from pyrler.utilities.resilience import RetryBudget
+from tests.mock_server import MockParler, _post
+
+
+def _posts(params):
+    if params.get("id") == "bad":
+        return 500, {"message": "Internal server error"}
+    return 200, {"post": _post(params.get("id"), 0)}
+
+
+class TestBulk(unittest.TestCase):
+    def setUp(self):
+        self.server = MockParler(responses={"/v1/post": _posts}).start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(client.close_sessions)
+        # Without retry budget a failing request gives up at once.
+        self.kwargs = dict(log_stdout=False, metrics=None, coalesce=False, parler_url=self.server.url,
+                           retry_budget=RetryBudget(ratio=0, min_retries=0), mst_cookie="mst", jst_cookie="jst")
+
+    def test_duplicates_are_fetched_once(self):
+        posts = pyrler.Post(**self.kwargs).get_posts(["a", "b", "a", "c", "b"], concurrency=2)
+        self.assertEqual(sorted(posts), ["a", "b", "c"])
+        self.assertEqual(posts["b"].json()["post"]["_id"], "b-post-0")
+        self.assertEqual(self.server.requests, 3)
+
+    def test_failures_map_to_none(self):
+        posts = pyrler.Post(**self.kwargs).get_posts(["a", "bad"])
+        self.assertIsNone(posts["bad"])
+        self.assertEqual(posts["a"].status_code, 200)
+
+    def test_stream(self):
+        results = pyrler.Post(**self.kwargs).get_posts(iter(["a", "b", "a"]), stream=True)
+        self.assertEqual(sorted(post_id for post_id, _ in results), ["a", "b"])
+
+    def test_async(self):
+        async def fetch():
+            async with aio.AsyncPost(**self.kwargs) as p:
+                posts = await p.get_posts(["a", "bad", "a", "b"], concurrency=2)
+                streamed = [post_id async for post_id, _ in p.get_posts(["c", "d", "c"], stream=True)]
+            return posts, streamed
+
+        posts, streamed = asyncio.run(fetch())
+        self.assertEqual(sorted(posts), ["a", "b", "bad"])
+        self.assertIsNone(posts["bad"])
+        self.assertEqual(posts["a"].json()["post"]["_id"], "a-post-0")
+        self.assertEqual(sorted(streamed), ["c", "d"])
+        self.assertEqual(self.server.requests, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import requests
+from pyrler.core import aio, pyrler
+from pyrler.utilities import client
+from pyrler.utilities.cache import ResponseCache
+from tests.mock_server import MockParler
+
+
+def _response(status=200, content=b'{"id": "1"}', headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = content
+    response.headers.update(headers or {})
+    response.url = "https://api.parler.com/v1/profile"
+    return response
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(":memory:", ttls={"/v1/profile": 60}, max_entries=2)
+        self.sent = []
+
+    def _send(self, response):
+        def send(headers):
+            self.sent.append(headers)
+            return response
+        return send
+
+    def test_hit_and_miss(self):
+        self.cache.get("/v1/profile", {"username": "a", "id": None}, self._send(_response()))
+        r = self.cache.get("/v1/profile", {"username": "a"}, self._send(_response()))
+        self.assertEqual(r.json(), {"id": "1"})
+        self.assertTrue(r.from_cache)
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_conditional_revalidation(self):
+        self.cache.get("/v1/profile", {"username": "a"}, self._send(_response(headers={"ETag": '"v1"'})))
+        self.cache.ttls["/v1/profile"] = 0
+        r = self.cache.get("/v1/profile", {"username": "a"}, self._send(_response(status=304, content=b"")))
+        self.assertEqual(self.sent[-1], {"If-None-Match": '"v1"'})
+        self.assertEqual(r.json(), {"id": "1"})
+        self.assertEqual(self.cache.stats()["revalidations"], 1)
+
+    def test_lru_eviction(self):
+        for username in ("a", "b"):
+            self.cache.get("/v1/profile", {"username": username}, self._send(_response()))
+        self.cache.get("/v1/profile", {"username": "a"}, self._send(_response()))
+        self.cache.get("/v1/profile", {"username": "c"}, self._send(_response()))
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get("/v1/profile", {"username": "b"}, self._send(_response()))
+        self.assertEqual(self.cache.stats()["misses"], 4)
+
+    def test_scopes_are_separate(self):
+        self.cache.get("/v1/profile", {}, self._send(_response()), scope="alice")
+        r = self.cache.get("/v1/profile", {}, self._send(_response(content=b'{"id": "2"}')), scope="bob")
+        self.assertEqual(r.json(), {"id": "2"})
+        self.assertEqual(len(self.sent), 2)
+
+    def test_endpoints_share_cached_responses_per_credentials(self):
+        cache = ResponseCache(":memory:")
+        self.addCleanup(client.close_sessions)
+        with MockParler() as server:
+            def profile(mst):
+                return pyrler.Profile(log_stdout=False, metrics=None, coalesce=False, cache=cache,
+                                      parler_url=server.url, mst_cookie=mst, jst_cookie="jst")
+            profile("alice").get_user_profile()
+            self.assertFalse(getattr(profile("bob").get_user_profile(), "from_cache", False))
+            self.assertTrue(profile("alice").get_user_profile().from_cache)
+            self.assertEqual(server.requests, 2)
+
+    def test_async_endpoints_reject_caches(self):
+        with self.assertRaises(ValueError):
+            aio.AsyncProfile(log_stdout=False, cache=self.cache, mst_cookie="mst", jst_cookie="jst")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import aio, pyrler
+from pyrler.utilities import client
+from pyrler.utilities.cassette import Cassette, CassetteMiss
+from tests.mock_server import MockParler
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "crawl.pyrc")
+
+    def tearDown(self):
+        client.close_sessions()
+        self.directory.cleanup()
+
+    def _walk(self, url, cassette):
+        p = pyrler.Post(log_stdout=False, coalesce=False, metrics=None, parler_url=url, cassette=cassette)
+        return [post["_id"] for post in p.get_user_posts(user_id="1", stream="items")]
+
+    def _record(self):
+        with MockParler(page_size=5, pages=4) as server, Cassette(self.path, mode="record") as cassette:
+            posts = self._walk(server.url, cassette)
+        client.close_sessions()
+        self.assertEqual(len(cassette), 4)
+        return server.url, posts
+
+    def test_replay_without_network(self):
+        url, recorded = self._record()
+        with Cassette(self.path, mode="replay") as cassette:
+            self.assertEqual(self._walk(url, cassette), recorded)
+            p = pyrler.Post(log_stdout=False, parler_url=url, cassette=cassette)
+            with self.assertRaises(CassetteMiss):
+                p.get_user_posts(user_id="2")
+
+    def test_rebuilds_stale_index(self):
+        url, recorded = self._record()
+        os.remove(self.path + ".idx")
+        with open(self.path, "ab") as f:
+            f.write(b"\x00\x00\x00\x05trunc")
+        with Cassette(self.path, mode="auto") as cassette:
+            self.assertEqual(len(cassette), 4)
+            self.assertEqual(self._walk(url, cassette), recorded)
+
+    def test_auto_records_misses(self):
+        with MockParler(page_size=5, pages=2) as server:
+            with Cassette(self.path) as cassette:
+                first = self._walk(server.url, cassette)
+                client.close_sessions()
+                self.assertEqual(self._walk(server.url, cassette), first)
+        self.assertEqual(server.requests, 2)
+
+    def test_mutations_are_not_replayed_in_auto_mode(self):
+        with MockParler() as server, Cassette(self.path) as cassette:
+            p = pyrler.Post(log_stdout=False, metrics=None, parler_url=server.url, cassette=cassette)
+            for body in ("first", "second", "second"):
+                self.assertFalse(getattr(p.post(body), "from_cassette", False))
+            self.assertEqual(len(server.uploads), 3)
+            for _ in range(2):
+                self.assertFalse(getattr(p.delete_post(post_id="1"), "from_cassette", False))
+            self.assertEqual(server.requests, 5)
+        client.close_sessions()
+        with Cassette(self.path, mode="replay") as cassette:
+            p = pyrler.Post(log_stdout=False, metrics=None, parler_url=server.url, cassette=cassette)
+            self.assertTrue(p.post("second").from_cassette)
+            with self.assertRaises(CassetteMiss):
+                p.post("third")
+
+    def test_async_endpoints_reject_cassettes(self):
+        with Cassette(self.path) as cassette, self.assertRaises(ValueError):
+            aio.AsyncPost(log_stdout=False, cassette=cassette)
+
+    def test_not_a_cassette(self):
+        with open(self.path, "wb") as f:
+            f.write(b"{}")
+        with self.assertRaises(ValueError):
+            Cassette(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
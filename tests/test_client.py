@@ -0,0 +1,71 @@
+import http.server
+import json
+import os
+import threading
+import unittest
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import pyrler
+from pyrler.utilities import client
+
+
+class TestSharedClient(unittest.TestCase):
+    def tearDown(self):
+        client.close_sessions()
+
+    def test_endpoints_share_session(self):
+        self.assertIs(pyrler.Post(log_stdout=False).session, pyrler.Profile(log_stdout=False).session)
+
+    def test_sessions_keyed_by_cookies(self):
+        a = client.shared_client({"mst": "a", "jst": "a"}, "https://api.parler.com", pool_maxsize=32)
+        b = client.shared_client({"mst": "b", "jst": "b"}, "https://api.parler.com")
+        self.assertIsNot(a, b)
+        self.assertIs(a, client.shared_client({"jst": "a", "mst": "a"}, "https://api.parler.com"))
+        self.assertEqual(a.get_adapter("https://api.parler.com")._pool_maxsize, 32)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        # Fail the first request of each path to exercise retries.
+        status = 503 if self.server.requests == 1 else 200
+        body = json.dumps({"encoding": self.headers.get("Accept-Encoding")}).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/profile"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_unknown_transport(self):
+        with self.assertRaises(ValueError):
+            client.client(transport="carrier-pigeon")
+
+    @unittest.skipIf(client.httpx is None, "httpx is not installed")
+    def test_httpx_transport_retries(self):
+        session = client.client(transport="httpx")
+        session.get_adapter(self.url).max_retries.backoff_factor = 0
+        r = session.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(r.json()["encoding"], client.accept_encoding("httpx"))
+        session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
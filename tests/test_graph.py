@@ -0,0 +1,67 @@
+import unittest
+from unittest import mock
+from pyrler.core import graph
+from pyrler.utilities.bloom import BloomFilter
+
+# user -> followers
+FOLLOWERS = {
+    "a": ["b", "c"],
+    "b": ["c", "d"],
+    "c": ["a"],
+    "d": ["e"],
+    "e": [],
+}
+
+
+class _Follow:
+    def __init__(self, **kwargs):
+        self.expanded = []
+
+    def get_followers(self, user_id=None, stream=None, **kwargs):
+        self.expanded.append(user_id)
+        return iter([{"id": follower} for follower in FOLLOWERS[user_id]])
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_membership(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(i)
+        self.assertTrue(all(i in bloom for i in range(1000)))
+        false_positives = sum(i in bloom for i in range(1000, 11000))
+        self.assertLess(false_positives, 300)
+        self.assertFalse(bloom.add(1))
+        self.assertGreater(len(bloom), 990)
+
+
+class TestFrontier(unittest.TestCase):
+    def test_pops_lowest_priority_first(self):
+        frontier = graph.Frontier()
+        frontier.push("late", 1, 1)
+        frontier.push("first", 0, 0)
+        frontier.push("second", 0, 0)
+        self.assertEqual(len(frontier), 3)
+        self.assertEqual([frontier.pop() for _ in range(4)], [("first", 0), ("second", 0), ("late", 1), None])
+
+
+class TestCrawlGraph(unittest.TestCase):
+    def crawl(self, **kwargs):
+        with mock.patch.object(graph.pyrler, "Follow", _Follow):
+            return list(graph.crawl_graph(["a"], direction="followers", concurrency=3, **kwargs))
+
+    def test_expands_each_user_once(self):
+        edges = self.crawl(max_depth=10)
+        self.assertEqual(sorted((e.follower, e.followee) for e in edges),
+                         sorted((f, u) for u, followers in FOLLOWERS.items() for f in followers))
+
+    def test_max_depth(self):
+        edges = self.crawl(max_depth=1)
+        self.assertEqual(sorted((e.follower, e.followee, e.depth) for e in edges), [("b", "a", 1), ("c", "a", 1)])
+
+    def test_max_nodes(self):
+        edges = self.crawl(max_depth=10, max_nodes=2)
+        self.assertEqual({e.followee for e in edges}, {"a", "b"})
+
+
+if __name__ == "__main__":
+    unittest.main()
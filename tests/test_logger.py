@@ -0,0 +1,54 @@
+import gzip
+import json
+import logging
+import os
+import tempfile
+import unittest
+from pyrler.utilities import logger as log
+
+
+class TestLogger(unittest.TestCase):
+    def setUp(self):
+        log.close_handlers()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "pyrler.log")
+
+    def tearDown(self):
+        log.close_handlers()
+        self.directory.cleanup()
+
+    def _lines(self, path):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as f:
+            return [json.loads(line) for line in f]
+
+    def test_json_lines_from_background_thread(self):
+        log.setup_handlers(log_stdout=False, log_file=self.path, json_lines=True)
+        log.setup_handlers(log_stdout=False, log_file=self.path)
+        self.assertEqual(log.logger.handlers, [log._queue_handler])
+        log.logger.info({"posts": [{"_id": "1"}]})
+        log.logger.warning("%s failed", "request")
+        log.flush_handlers()
+        lines = self._lines(self.path)
+        self.assertEqual([line["message"] for line in lines], [{"posts": [{"_id": "1"}]}, "request failed"])
+        self.assertEqual(lines[1]["level"], "WARNING")
+
+    def test_rotation_with_compression(self):
+        log.setup_handlers(log_stdout=False, log_file=self.path, json_lines=True, max_bytes=200, compress=True)
+        for i in range(20):
+            log.logger.info({"i": i})
+        log.flush_handlers()
+        rotated = sorted(f for f in os.listdir(self.directory.name) if f.endswith(".gz"))
+        self.assertTrue(rotated)
+        self.assertTrue(self._lines(os.path.join(self.directory.name, rotated[0])))
+
+    def test_foreground(self):
+        log.setup_handlers(log_stdout=False, log_file=self.path, background=False)
+        self.assertIsInstance(log.logger.handlers[0], logging.FileHandler)
+        log.logger.info("written")
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "written\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import hashlib
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+from pyrler.core.media import download_media, media_urls
+from pyrler.utilities import client
+
+IMAGE = bytes(range(256)) * 400
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("Range")))
+        start = int(self.headers["Range"][len("bytes="):-1]) if self.headers.get("Range") else 0
+        body = IMAGE[start:]
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.path == "/flaky.jpeg" and not start and self.server.cut:
+            # Drop the connection half way through the first attempt.
+            self.server.cut = False
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMedia(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = []
+        self.server.cut = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client.close_sessions()
+        self.directory.cleanup()
+
+    def _download(self, paths):
+        return list(download_media([self.url + path for path in paths], self.directory.name, concurrency=2))
+
+    def test_content_addressed(self):
+        results = self._download(["/a.jpeg", "/b.jpeg", "/a.jpeg"])
+        sha256 = hashlib.sha256(IMAGE).hexdigest()
+        self.assertEqual(len(results), 2)
+        self.assertEqual({r.path for r in results}, {os.path.join(sha256[:2], sha256 + ".jpeg")})
+        with open(os.path.join(self.directory.name, results[0].path), "rb") as f:
+            self.assertEqual(f.read(), IMAGE)
+
+        self.server.requests.clear()
+        self.assertEqual(len(self._download(["/a.jpeg"])), 1)
+        self.assertEqual(self.server.requests, [])
+
+    def test_resumes_with_range(self):
+        self.server.cut = True
+        first, = self._download(["/flaky.jpeg"])
+        self.assertIsNotNone(first.error)
+        second, = self._download(["/flaky.jpeg"])
+        self.assertIsNone(second.error)
+        self.assertEqual(self.server.requests[-1], ("/flaky.jpeg", f"bytes={len(IMAGE) // 2}-"))
+        self.assertEqual(second.sha256, hashlib.sha256(IMAGE).hexdigest())
+
+    def test_media_urls(self):
+        item = {"_id": "1", "filename": "abc.jpeg", "media": [{"url": "https://video.parler.com/x.mp4"}],
+                "body": "not a url.jpeg", "image": "https://images.parler.com/abc.jpeg"}
+        self.assertEqual(media_urls(item), ["https://images.parler.com/abc.jpeg", "https://video.parler.com/x.mp4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
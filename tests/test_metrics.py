@@ -0,0 +1,112 @@
+import http.server
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import pyrler
+from pyrler.utilities import client
+from pyrler.utilities.metrics import Metrics
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        # Rate limit the first request.
+        status = 429 if self.server.requests == 1 else 200
+        startkey = self.path.partition("startkey=")[2] or None
+        body = json.dumps({"posts": [{"_id": "1"}, {"_id": "2"}], "next": "b" if startkey is None else None,
+                           "last": startkey is not None}).encode()
+        self.send_response(status)
+        self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMetrics(unittest.TestCase):
+    def test_prometheus_format(self):
+        metrics = Metrics()
+        metrics.record_request("GET", "/v1/post", 200, 0.3, bytes_in=10)
+        metrics.record_request("GET", "/v1/post", 200, 0.03, bytes_in=5)
+        text = metrics.prometheus()
+        self.assertIn('pyrler_requests_total{method="GET",route="/v1/post",status="200"} 2', text)
+        self.assertIn('pyrler_request_duration_seconds_bucket{method="GET",route="/v1/post",le="0.05"} 1', text)
+        self.assertIn('pyrler_request_duration_seconds_bucket{method="GET",route="/v1/post",le="+Inf"} 2', text)
+        self.assertIn('pyrler_response_bytes_total{method="GET",route="/v1/post"} 15', text)
+        self.assertEqual(metrics.get("pyrler_request_duration_seconds", method="GET", route="/v1/post")["count"], 2)
+
+    def test_write_and_serve(self):
+        metrics = Metrics()
+        metrics.inc("pyrler_retries_total", method="GET", route="/v1/post")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "pyrler.prom")
+            metrics.write(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), metrics.prometheus())
+        server = metrics.serve(port=0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as r:
+                self.assertEqual(r.read().decode(), metrics.prometheus())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client.close_sessions()
+
+    def test_requests_and_walks(self):
+        metrics = Metrics()
+        p = pyrler.Post(log_stdout=False, metrics=metrics, coalesce=False)
+        p.parler_url = f"http://127.0.0.1:{self.server.server_port}"
+        p.session.get_adapter(p.parler_url).max_retries.backoff_factor = 0
+        self.assertEqual(len(p.get_user_posts(user_id="u", follow=True)), 2)
+
+        labels = {"method": "GET", "route": "/v1/post/creator"}
+        self.assertEqual(metrics.get("pyrler_requests_total", status="200", **labels), 2)
+        self.assertEqual(metrics.get("pyrler_retries_total", **labels), 1)
+        self.assertEqual(metrics.get("pyrler_rate_limited_total", **labels), 1)
+        walk = "Post.get_user_posts"
+        self.assertEqual(metrics.get("pyrler_walk_pages", walk=walk)["sum"], 2)
+        self.assertEqual(metrics.get("pyrler_page_items", walk=walk), {"count": 2, "sum": 4, "buckets": {
+            0: 0, 1: 0, 5: 2, 10: 0, 20: 0, 50: 0, 100: 0, 200: 0, 500: 0}})
+
+    def test_routes_are_labelled_by_template(self):
+        metrics = Metrics()
+        p = pyrler.Post(log_stdout=False, metrics=metrics, coalesce=False)
+        p.parler_url = f"http://127.0.0.1:{self.server.server_port}"
+        p.session.get_adapter(p.parler_url).max_retries.backoff_factor = 0
+        for post_id in ("a", "b", "c"):
+            p.get_impressions(post_id)
+        self.assertEqual(metrics.get("pyrler_requests_total", method="GET", route="/v1/post/{id}/impressions",
+                                     status="200"), 3)
+        self.assertNotIn("/v1/post/a/impressions", metrics.prometheus())
+
+    def test_route_template(self):
+        self.assertEqual(client.route_template("/v1/messaging/conversations/c1/mute"),
+                         "/v1/messaging/conversations/{id}/mute")
+        self.assertEqual(client.route_template("/v1/messaging/conversations/user/u1"),
+                         "/v1/messaging/conversations/user/{id}")
+        self.assertEqual(client.route_template("/v1/messaging/conversations/user"), "/v1/messaging/conversations/user")
+        self.assertEqual(client.route_template("/v1/post/creator"), "/v1/post/creator")
+
+
+if __name__ == "__main__":
+    unittest.main()
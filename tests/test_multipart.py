@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+from urllib3.filepost import encode_multipart_formdata
+from pyrler.core import aio, pyrler
+from pyrler.utilities.accounts import AccountPool
+from pyrler.utilities.multipart import MultipartEncoder
+from tests.mock_server import MockParler
+
+
+class TestMultipartEncoder(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "photo.png")
+        with open(self.path, "wb") as f:
+            f.write(os.urandom(300000))
+        with open(self.path, "rb") as f:
+            self.content = f.read()
+
+    def test_body_matches_urllib3_encoding(self):
+        with MultipartEncoder([("caption", "hello"), ("upload", ("photo.png", self.path))], boundary="b0und") as body:
+            expected, content_type = encode_multipart_formdata(
+                [("caption", "hello"), ("upload", ("photo.png", self.content, "image/png"))], boundary="b0und"
+            )
+            self.assertEqual(body.content_type, content_type)
+            self.assertEqual(len(body), len(expected))
+            self.assertEqual(b"".join(iter(lambda: body.read(1000), b"")), expected)
+
+    def test_seek_and_progress(self):
+        progress = []
+        with MultipartEncoder({"upload": ("photo.png", self.path)}, callback=lambda sent, total: progress.append(
+                (sent, total))) as body:
+            first = b"".join(body)
+            self.assertEqual(body.tell(), len(body))
+            self.assertEqual(progress[-1], (len(body), len(body)))
+            body.seek(0)
+            self.assertEqual(body.read(), first)
+            body.seek(-10, os.SEEK_END)
+            self.assertEqual(body.read(), first[-10:])
+
+    def test_upload_through_mock_server(self):
+        with MockParler(responses={"/v1/profile/photo": {"status": "ok"}}) as server:
+            p = pyrler.Profile(log_stdout=False, metrics=None, parler_url=server.url, mst_cookie="mst",
+                               jst_cookie="jst")
+            progress = []
+            response = p.upload_profile_photo(self.path, progress=lambda sent, total: progress.append(sent))
+            self.assertEqual(response.status_code, 200)
+        route, content_type, body = server.uploads[0]
+        self.assertEqual(route, "/v1/profile/photo")
+        self.assertTrue(content_type.startswith("multipart/form-data; boundary="))
+        self.assertIn(self.content, body)
+        self.assertIn(b'name="upload"; filename="photo.png"', body)
+        self.assertEqual(progress[-1], len(body))
+        self.assertEqual(self._open(), [])
+
+    def _open(self):
+        # Descriptors of this process open on the photo, on Linux.
+        fds = "/proc/self/fd"
+        if not os.path.isdir(fds):
+            return []
+        return [fd for fd in os.listdir(fds) if os.path.realpath(os.path.join(fds, fd)) == os.path.realpath(self.path)]
+
+    def test_async_upload_is_sent_before_the_file_is_closed(self):
+        async def upload(url):
+            async with aio.AsyncProfile(log_stdout=False, metrics=None, mst_cookie="mst", jst_cookie="jst") as p:
+                p.parler_url = url
+                return await p.upload_profile_photo(self.path)
+
+        closed_at = []
+        close = MultipartEncoder.close
+
+        def record_close(body):
+            closed_at.append((body.tell(), len(body)))
+            close(body)
+
+        with MockParler(responses={"/v1/profile/photo": {"status": "ok"}}) as server, \
+                mock.patch.object(MultipartEncoder, "close", record_close):
+            self.assertEqual(asyncio.run(upload(server.url)).status_code, 200)
+        self.assertIn(self.content, server.uploads[0][2])
+        # The body is closed once it has been sent, not when the coroutine is created.
+        position, size = closed_at[0]
+        self.assertEqual(position, size)
+        self.assertEqual(self._open(), [])
+
+    def test_uploads_are_sent_once_with_an_account_pool(self):
+        with MockParler(responses={"/v1/profile/cover-photo": lambda params: (429, {"message": "Too many"})}) as server:
+            pool = AccountPool([("mst1", "jst1"), ("mst2", "jst2")])
+            p = pyrler.Profile(log_stdout=False, metrics=None, accounts=pool, parler_url=server.url)
+            self.assertEqual(p.upload_cover_photo(self.path).status_code, 429)
+        self.assertEqual(len(server.uploads), 1)
+        self.assertIn(self.content, server.uploads[0][2])
+
+if __name__ == "__main__":
+    unittest.main()
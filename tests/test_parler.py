@@ -0,0 +1,40 @@
+import os
+import unittest
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+import pyrler
+from pyrler.core import pyrler as endpoints
+from pyrler.utilities import client
+from pyrler.utilities.logger import logger, setup_handlers
+
+
+class TestParler(unittest.TestCase):
+    def tearDown(self):
+        client.close_sessions()
+
+    def test_endpoints_are_lazy_and_shared(self):
+        parler = pyrler.Parler(log_stdout=False, mst_cookie="a", jst_cookie="b")
+        self.assertEqual(parler._endpoints, {})
+        post = parler.post
+        self.assertIsInstance(post, endpoints.Post)
+        self.assertIs(parler.post, post)
+        self.assertEqual(list(parler._endpoints), ["post"])
+        self.assertIs(parler.profile.session, post.session)
+        self.assertEqual(parler.follow.cookies, {"mst": "a", "jst": "b"})
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            pyrler.Parler(log_stdout=False).posts
+
+    def test_handlers_added_once(self):
+        before = len(logger.handlers)
+        for _ in range(3):
+            setup_handlers(log_stdout=True)
+            endpoints.Post(log_stdout=True)
+        self.assertLessEqual(len(logger.handlers), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
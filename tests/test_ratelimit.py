@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+from pyrler.utilities.ratelimit import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_wait(self):
+        limiter = RateLimiter(rate=2, burst=2)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertGreater(limiter.reserve(), 0)
+
+    def test_route_budget(self):
+        limiter = RateLimiter(rate=100, routes={"/v1/profile": 1})
+        self.assertEqual(limiter.reserve("/v1/profile"), 0)
+        self.assertGreater(limiter.reserve("/v1/profile"), 0)
+        self.assertEqual(limiter.reserve("/v1/post"), 0)
+
+    def test_penalize_and_reward(self):
+        limiter = RateLimiter(rate=4, recovery=0.5)
+        limiter.penalize(retry_after=30)
+        self.assertEqual(limiter.rate(), 2)
+        self.assertGreater(limiter.reserve(), 29)
+        limiter.reward()
+        limiter.reward()
+        self.assertEqual(limiter.rate(), 4)
+
+    def test_shared_state_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rate.json")
+            a = RateLimiter(rate=1, path=path)
+            b = RateLimiter(rate=1, path=path)
+            self.assertEqual(a.reserve(), 0)
+            self.assertGreater(b.reserve(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
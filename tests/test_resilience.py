@@ -0,0 +1,163 @@
+import http.server
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+import requests
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.utilities import client
+from pyrler.utilities.resilience import AdaptiveTimeout, CircuitBreaker, CircuitOpen, RetryBudget
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAdaptiveTimeout(unittest.TestCase):
+    def test_percentile(self):
+        timeouts = AdaptiveTimeout(default=2, percentile=0.9, multiplier=2, min_timeout=0.1, min_samples=10)
+        self.assertEqual(timeouts.timeout("/v1/post"), 2)
+        for i in range(1, 11):
+            timeouts.observe("/v1/post", i / 10)
+        self.assertAlmostEqual(timeouts.timeout("/v1/post"), 1.8)
+        self.assertEqual(timeouts.timeout("/v1/comment"), 2)
+
+    def test_timed_out_attempts_count_as_samples(self):
+        timeouts = AdaptiveTimeout(default=1, percentile=0.5, multiplier=2, min_timeout=0.1, min_samples=4)
+        timeouts.timed_out("/v1/post", 1, attempts=4)
+        self.assertEqual(timeouts.timeout("/v1/post"), 2)
+
+    def test_bounds(self):
+        timeouts = AdaptiveTimeout(min_timeout=1, max_timeout=5, min_samples=1)
+        timeouts.observe("/v1/post", 0.01)
+        self.assertEqual(timeouts.timeout("/v1/post"), 1)
+        timeouts.observe("/v1/post", 60)
+        self.assertEqual(timeouts.timeout("/v1/post"), 5)
+
+
+class TestRetryBudget(unittest.TestCase):
+    def test_ratio(self):
+        budget = RetryBudget(ratio=0.2, min_retries=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        for _ in range(10):
+            budget.request()
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_and_probes(self):
+        breaker = CircuitBreaker(failures=2, recovery=10)
+        with mock.patch("time.monotonic", return_value=100):
+            breaker.record("/v1/post", False)
+            breaker.allow("/v1/post")
+            breaker.record("/v1/post", False)
+            self.assertEqual(breaker.state("/v1/post"), "open")
+            with self.assertRaises(CircuitOpen):
+                breaker.allow("/v1/post")
+            breaker.allow("/v1/comment")
+        with mock.patch("time.monotonic", return_value=110):
+            breaker.allow("/v1/post")
+            # Only one probe at a time.
+            with self.assertRaises(CircuitOpen):
+                breaker.allow("/v1/post")
+            breaker.record("/v1/post", False)
+            self.assertEqual(breaker.state("/v1/post"), "open")
+        with mock.patch("time.monotonic", return_value=120):
+            breaker.allow("/v1/post")
+            breaker.record("/v1/post", True)
+            self.assertEqual(breaker.state("/v1/post"), "closed")
+
+    def test_abandoned_probe_is_released(self):
+        breaker = CircuitBreaker(failures=1, recovery=10)
+        with mock.patch("time.monotonic", return_value=100):
+            breaker.record("/v1/post", False)
+        with mock.patch("time.monotonic", return_value=110):
+            breaker.allow("/v1/post")
+            breaker.abandon("/v1/post")
+            self.assertEqual(breaker.state("/v1/post"), "open")
+            breaker.abandon("/v1/comment")
+            self.assertEqual(breaker.state("/v1/comment"), "closed")
+        with mock.patch("time.monotonic", return_value=120):
+            breaker.allow("/v1/post")
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.requests = 0
+        self.server.status = 503
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/post"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retry_budget_stops_retries(self):
+        session = client.client(retry_budget=RetryBudget(ratio=0, min_retries=0))
+        with self.assertRaises(requests.exceptions.RetryError):
+            session.get(self.url)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_circuit_breaker_fails_fast(self):
+        session = client.client(retry_budget=RetryBudget(ratio=0, min_retries=0),
+                                breaker=CircuitBreaker(failures=2))
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.RetryError):
+                session.get(self.url)
+        with self.assertRaises(CircuitOpen):
+            session.get(self.url)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_unexpected_errors_release_probes(self):
+        breaker = CircuitBreaker(failures=1, recovery=0)
+        breaker.record("/v1/post", False)
+        session = client.client(breaker=breaker)
+        with mock.patch.object(client.TimeoutHTTPAdapter, "transmit", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                session.get(self.url)
+        self.server.status = 200
+        self.assertEqual(session.get(self.url).status_code, 200)
+        self.assertEqual(breaker.state("/v1/post"), "closed")
+
+    def test_observes_response_times(self):
+        self.server.status = 200
+        timeouts = AdaptiveTimeout(min_samples=1)
+        client.client(timeouts=timeouts).get(self.url)
+        self.assertLess(timeouts.timeout("/v1/post"), 2)
+
+    def test_timeouts_grow_when_every_attempt_times_out(self):
+        self.server.status = 200
+        self.server.delay = 0.3
+        timeouts = AdaptiveTimeout(default=0.1, min_timeout=0.05, min_samples=2)
+        session = client.client(timeouts=timeouts)
+        session.get_adapter(self.url).max_retries.backoff_factor = 0
+        response = None
+        for _ in range(8):
+            try:
+                response = session.get(self.url)
+                break
+            except requests.exceptions.ConnectionError:
+                continue
+        self.assertIsNotNone(response)
+        self.assertGreater(timeouts.timeout("/v1/post"), 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+import requests
+from pyrler.utilities.response import wrap, items
+
+
+class TestParlerResponse(unittest.TestCase):
+    def _response(self, content):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = content
+        response.encoding = "utf-8"
+        return wrap(response)
+
+    def test_json_decoded_once(self):
+        r = self._response(b'{"posts": [{"_id": "1"}, {"_id": "2"}], "next": "k"}')
+        self.assertIs(r.json(), r.json())
+        self.assertEqual(len(items(r.json())), 2)
+
+    def test_invalid_json_raises_requests_error(self):
+        with self.assertRaises(requests.exceptions.JSONDecodeError):
+            self._response(b"<html>").json()
+
+
+if __name__ == "__main__":
+    unittest.main()
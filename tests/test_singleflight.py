@@ -0,0 +1,49 @@
+import threading
+import time
+import unittest
+from pyrler.core import pyrler
+from pyrler.utilities import client
+from pyrler.utilities.singleflight import SingleFlight
+from tests.mock_server import MockParler
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_result(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return object()
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+
+    def test_errors_are_shared_and_not_cached(self):
+        flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            flight.do("key", lambda: int("x"))
+        self.assertEqual(flight.do("key", lambda: 1), 1)
+
+    def test_endpoints_coalesce_per_credentials(self):
+        self.addCleanup(client.close_sessions)
+        with MockParler(latency=0.2) as server:
+            profiles = [pyrler.Profile(log_stdout=False, metrics=None, parler_url=server.url, mst_cookie=mst,
+                                       jst_cookie="jst") for mst in ("alice", "alice", "bob")]
+            threads = [threading.Thread(target=p.get_profile_settings) for p in profiles]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEqual(server.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
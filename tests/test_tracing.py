@@ -0,0 +1,90 @@
+import http.server
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+os.environ.setdefault("MST_COOKIE", "mst")
+os.environ.setdefault("JST_COOKIE", "jst")
+
+from pyrler.core import pyrler
+from pyrler.utilities import client
+from pyrler.utilities.tracing import Tracer
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        startkey = self.path.partition("startkey=")[2] or None
+        body = json.dumps({"posts": [{"_id": "1"}, {"_id": "2"}], "next": "b" if startkey is None else None,
+                           "last": startkey is not None}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHooks(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client.close_sessions()
+
+    def _post(self, **kwargs):
+        p = pyrler.Post(log_stdout=False, coalesce=False, **kwargs)
+        p.parler_url = f"http://127.0.0.1:{self.server.server_port}"
+        return p
+
+    def test_hooks_fire_in_order(self):
+        events = []
+        p = self._post(hooks={
+            "before_request": lambda method, route, kwargs: events.append("before_request"),
+            "after_response": lambda method, route, response, elapsed: events.append("after_response"),
+            "on_page": lambda walk, response, number, elapsed: events.append(f"page {number}"),
+            "on_item": lambda walk, item: events.append(item["_id"]),
+            "on_walk": lambda walk, pages, elapsed: events.append(f"walk {pages}"),
+        })
+        list(p.get_user_posts(user_id="u", stream="items"))
+        self.assertEqual(events, ["before_request", "after_response", "page 1", "1", "2",
+                                  "before_request", "after_response", "page 2", "1", "2", "walk 2"])
+
+    def test_unknown_hook(self):
+        with self.assertRaises(ValueError):
+            self._post(hooks={"on_everything": print})
+
+    def test_chrome_trace(self):
+        tracer = Tracer()
+        p = tracer.install(self._post())
+        with tracer.span("crawl"):
+            p.get_user_posts(user_id="u", follow=True)
+        events = tracer.chrome_trace()["traceEvents"]
+        self.assertEqual([e["cat"] for e in events if e["cat"] in ("page", "walk", "call")],
+                         ["page", "page", "walk", "call"])
+        self.assertEqual(sum(e["cat"] == "decode" for e in events), 2)
+        crawl = events[-1]
+        self.assertTrue(all(crawl["ts"] <= e["ts"] and e["ts"] + e["dur"] <= crawl["ts"] + crawl["dur"] + 1
+                            for e in events))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer.write(path)
+            with open(path) as f:
+                self.assertEqual(len(json.load(f)["traceEvents"]), len(events))
+
+    def test_profiler(self):
+        tracer = Tracer()
+        tracer.start_profiler(interval=0.001)
+        time.sleep(0.05)
+        tracer.stop_profiler()
+        self.assertTrue(any("test_profiler" in stack for stack in tracer.samples))
+
+
+if __name__ == "__main__":
+    unittest.main()
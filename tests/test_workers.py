@@ -0,0 +1,37 @@
+import threading
+import unittest
+from pyrler.utilities.workers import stream
+
+
+class TestStream(unittest.TestCase):
+    def test_results_from_every_task(self):
+        def work(task, emit):
+            for i in range(task):
+                emit((task, i))
+
+        results = list(stream(range(20), work, concurrency=4, buffer=3))
+        self.assertEqual(len(results), sum(range(20)))
+
+    def test_errors_reach_the_consumer(self):
+        def work(task, emit):
+            raise KeyError(task)
+
+        with self.assertRaises(KeyError):
+            list(stream(range(3), work))
+
+    def test_early_stop_releases_workers(self):
+        released = threading.Event()
+
+        def work(task, emit):
+            while emit(task):
+                pass
+            released.set()
+
+        results = stream([1], work, concurrency=1, buffer=1)
+        next(results)
+        results.close()
+        self.assertTrue(released.wait(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import datetime
+import json
+import unittest
+import requests
+from pyrler.utilities.keys import format_key
+from pyrler.utilities.response import wrap
+from pyrler.utilities.state import CheckpointStore, SyncStore
+from pyrler.utilities.wrappers import paginate, iter_items, iter_pages, seek
+
+
+def _page(posts, next=None, last=False):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps({"posts": posts, "next": next, "last": last}).encode()
+    return wrap(response)
+
+
+class _Endpoint:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    @paginate
+    def get_user_posts(self, user_id=None, startkey=None, follow=None, **kwargs):
+        self.requested.append(startkey)
+        return self.pages[startkey]
+
+
+class TestPaginate(unittest.TestCase):
+    def setUp(self):
+        self.endpoint = _Endpoint({
+            None: _page([{"_id": "1"}, {"_id": "2"}], next="2021-02-03"),
+            "2021-02-03": _page([{"_id": "3"}], next="2021-02-02"),
+            "2021-02-02": _page([{"_id": "4"}], next="2021-02-01"),
+            "2021-02-01": _page([{"_id": "5"}], last=True),
+        })
+
+    def test_follow_returns_every_page(self):
+        self.assertEqual(len(self.endpoint.get_user_posts(user_id="u", follow=True)), 4)
+
+    def test_endkey(self):
+        pages = self.endpoint.get_user_posts(user_id="u", follow=True, endkey="2021-02-02T12")
+        self.assertEqual(len(pages), 2)
+
+    def test_streams_are_lazy(self):
+        pages = iter_pages(self.endpoint.get_user_posts, user_id="u")
+        self.assertEqual(self.endpoint.requested, [])
+        next(pages)
+        self.assertEqual(self.endpoint.requested, [None])
+        ids = [post["_id"] for post in iter_items(self.endpoint.get_user_posts, user_id="u")]
+        self.assertEqual(ids, ["1", "2", "3", "4", "5"])
+
+    def test_repeated_next_stops(self):
+        self.endpoint.pages["2021-02-03"] = _page([{"_id": "3"}], next="2021-02-03")
+        self.assertEqual(len(self.endpoint.get_user_posts(user_id="u", follow=True)), 2)
+
+    def test_resume_from_checkpoint(self):
+        checkpoint = CheckpointStore(":memory:")
+        pages = self.endpoint.get_user_posts(user_id="u", stream="pages", checkpoint=checkpoint)
+        next(pages)
+        next(pages)
+        del pages
+        self.endpoint.requested = []
+        posts = self.endpoint.get_user_posts(user_id="u", stream="items", checkpoint=checkpoint, resume=True)
+        self.assertEqual([post["_id"] for post in posts], ["3", "4", "5"])
+        self.assertEqual(self.endpoint.requested, ["2021-02-03", "2021-02-02", "2021-02-01"])
+        self.assertEqual(len(self.endpoint.get_user_posts(user_id="u", follow=True, resume=True,
+                                                          checkpoint=checkpoint)), 4)
+
+
+class _Timeline:
+    """
+    Serves 100 hourly posts newest first, two per page, paging on time keys.
+    """
+
+    def __init__(self):
+        start = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+        self.posts = [{"_id": str(i), "createdAt": (start + datetime.timedelta(hours=i)).strftime("%Y%m%d%H%M%S")}
+                      for i in reversed(range(100))]
+        self.requests = 0
+
+    @paginate
+    def get_user_posts(self, user_id=None, startkey=None, follow=None, **kwargs):
+        self.requests += 1
+        self.kwargs = kwargs
+        posts = [p for p in self.posts if startkey is None or format_key(p["createdAt"]) < startkey][:2]
+        return _page(posts, next=format_key(posts[-1]["createdAt"]) if len(posts) == 2 else None,
+                     last=len(posts) < 2)
+
+
+class TestTimePaginate(unittest.TestCase):
+    def test_shards_merge_in_order_without_duplicates(self):
+        timeline = _Timeline()
+        posts = timeline.get_user_posts(user_id="u", shards=4, since=datetime.datetime(2021, 1, 2),
+                                        until=datetime.datetime(2021, 1, 4), stream="items")
+        ids = [int(post["_id"]) for post in posts]
+        self.assertEqual(ids, list(reversed(range(24, 73))))
+
+    def test_shards_require_since_and_items(self):
+        timeline = _Timeline()
+        with self.assertRaises(ValueError):
+            timeline.get_user_posts(user_id="u", shards=4)
+        with self.assertRaises(ValueError):
+            timeline.get_user_posts(user_id="u", shards=4, since=datetime.datetime(2021, 1, 2), stream="pages")
+
+    def test_single_page_since(self):
+        timeline = _Timeline()
+        r = timeline.get_user_posts(user_id="u", since=datetime.datetime(2021, 1, 2),
+                                    until=datetime.datetime(2021, 1, 2, 5))
+        self.assertEqual([post["_id"] for post in r.json()["posts"]], ["29", "28"])
+        self.assertNotIn("endkey", timeline.kwargs)
+
+    def test_seek(self):
+        timeline = _Timeline()
+        startkey = seek(timeline.get_user_posts, datetime.datetime(2021, 1, 2, 5), user_id="u")
+        self.assertEqual(timeline.requests, 1)
+        self.assertEqual(timeline.get_user_posts(user_id="u", startkey=startkey).json()["posts"][0]["_id"], "29")
+
+    def test_items_trimmed_to_window(self):
+        timeline = _Timeline()
+        posts = timeline.get_user_posts(user_id="u", since=datetime.datetime(2021, 1, 2, 5),
+                                        until=datetime.datetime(2021, 1, 2, 8), stream="items")
+        self.assertEqual([post["_id"] for post in posts], ["32", "31", "30", "29"])
+        self.assertEqual(timeline.requests, 3)
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        self.timeline = _Timeline()
+        self.sync = SyncStore(":memory:")
+        self.addCleanup(self.sync.close)
+
+    def _publish(self, *hours):
+        start = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+        new = [{"_id": str(h), "createdAt": (start + datetime.timedelta(hours=h)).strftime("%Y%m%d%H%M%S")}
+               for h in sorted(hours, reverse=True)]
+        self.timeline.posts[:0] = new
+
+    def test_incremental_returns_only_new_items(self):
+        first = self.timeline.get_user_posts(user_id="u", sync=self.sync, incremental=True)
+        self.assertEqual(len(first), 100)
+        self._publish(100, 101, 102)
+        self.timeline.requests = 0
+        new = self.timeline.get_user_posts(user_id="u", sync=self.sync, incremental=True, stream="items")
+        self.assertEqual([post["_id"] for post in new], ["102", "101", "100"])
+        self.assertEqual(self.timeline.requests, 2)
+        self.assertEqual(self.timeline.get_user_posts(user_id="u", sync=self.sync, incremental=True), [])
+
+    def test_subjects_are_synced_separately(self):
+        self.timeline.get_user_posts(user_id="u", sync=self.sync, incremental=True)
+        self.assertEqual(len(self.timeline.get_user_posts(user_id="v", sync=self.sync, incremental=True)), 100)
+
+    def test_interrupted_sync_is_not_recorded(self):
+        posts = self.timeline.get_user_posts(user_id="u", sync=self.sync, incremental=True, stream="items")
+        next(posts)
+        posts.close()
+        self.assertEqual(len(self.timeline.get_user_posts(user_id="u", sync=self.sync, incremental=True)), 100)
+
+    def test_incremental_requires_a_store(self):
+        with self.assertRaises(ValueError):
+            self.timeline.get_user_posts(user_id="u", incremental=True)
+
+
+if __name__ == "__main__":
+    unittest.main()